@@ -0,0 +1,71 @@
+# Compact integer keys for addresses, ports and flows in the analysis scripts
+#
+# An address becomes one int (IPv6 tagged with bit 128 so it can never equal
+# an IPv4 key), a port an int with N/A as 0x10000, and a 4-tuple one packed
+# int. The CSV text is parsed once per distinct address and the resulting
+# key is interned, so repeated addresses share a single object. Keys are
+# turned back into text only when results are printed.
+import socket
+
+from packet_parser import address_format
+
+PORT_BITS = 17
+NO_PORT = 1 << 16
+ADDRESS_BITS = 129
+IPV6_TAG = 1 << 128
+
+MAX_INTERNED = 1 << 20
+interned_addresses = {}
+
+
+# Function to turn an address from the CSV into its key
+def ip_key(text):
+    key = interned_addresses.get(text)
+    if key is None:
+        if ":" in text:
+            key = int.from_bytes(socket.inet_pton(socket.AF_INET6, text), "big") | IPV6_TAG
+        else:
+            key = int.from_bytes(socket.inet_aton(text), "big")
+        if len(interned_addresses) >= MAX_INTERNED:
+            interned_addresses.clear()
+        interned_addresses[text] = key
+    return key
+
+
+# Function to turn a packed address (as returned by packet_parser) into its key
+def packed_ip_key(addr):
+    key = int.from_bytes(addr, "big")
+    return key | IPV6_TAG if len(addr) == 16 else key
+
+
+def port_key(text):
+    return NO_PORT if text == "N/A" else int(text)
+
+
+def flow_key(src_ip, src_port, dest_ip, dest_port):
+    return ((((src_ip << PORT_BITS) | src_port) << ADDRESS_BITS | dest_ip) << PORT_BITS) | dest_port
+
+
+def split_flow_key(key):
+    dest_port = key & (NO_PORT | 0xFFFF)
+    key >>= PORT_BITS
+    dest_ip = key & ((1 << ADDRESS_BITS) - 1)
+    key >>= ADDRESS_BITS
+    return key >> PORT_BITS, key & (NO_PORT | 0xFFFF), dest_ip, dest_port
+
+
+# Function to format an address key into standard format
+def format_ip_key(key):
+    if key & IPV6_TAG:
+        return address_format((key ^ IPV6_TAG).to_bytes(16, "big"))
+    return address_format(key.to_bytes(4, "big"))
+
+
+def format_port_key(port):
+    return "N/A" if port == NO_PORT else str(port)
+
+
+# Function to format a flow key as (src ip, src port, dest ip, dest port) strings
+def format_flow_key(key):
+    src_ip, src_port, dest_ip, dest_port = split_flow_key(key)
+    return format_ip_key(src_ip), format_port_key(src_port), format_ip_key(dest_ip), format_port_key(dest_port)
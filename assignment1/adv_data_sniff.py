@@ -1,102 +1,110 @@
+import argparse
+import os
 import socket
-import struct
-
-# Define constants
-ETH_P_ALL = 0x0003  
-BUFFER_SIZE = 65535
-
-# Function to format IP address
-def ip_format(addr):
-    return ".".join(map(str, addr))
-
-# Function to parse Ethernet header
-def parse_ethernet_header(raw_data):
-    dest_mac, src_mac, eth_proto = struct.unpack("!6s6sH", raw_data[:14])
-    return socket.htons(eth_proto), raw_data[14:]
-
-# Function to parse IPv4 header
-def parse_ipv4_header(raw_data):
-    ip_header = struct.unpack("!BBHHHBBH4s4s", raw_data[:20])
-    header_length = (ip_header[0] & 15) * 4
-    src_ip = ip_format(ip_header[8])
-    dest_ip = ip_format(ip_header[9])
-    proto = ip_header[6]
-    return src_ip, dest_ip, proto, raw_data[header_length:]
-
-# Function to parse TCP header
-def parse_tcp_header(raw_data):
-    tcp_header = struct.unpack("!HHLLBBHHH", raw_data[:20])  # Correct TCP header parsing
-    src_port = tcp_header[0]
-    dest_port = tcp_header[1]
-    sequence = tcp_header[2]
-    ack = tcp_header[3]
-    offset_reserved_flags = tcp_header[4]
-    header_length = (offset_reserved_flags >> 4) * 4  # Extract TCP header length
-    window = tcp_header[5]
-    checksum = tcp_header[6]
-    urg_pointer = tcp_header[7]
-    
-    return src_port, dest_port, checksum, raw_data[header_length:]
-    
+import time
+
+from bpf_filter import attach_filter
+from capture import open_raw_socket, recv_frames
+from payload_matcher import PayloadMatcher
+from tcp_reassembly import StreamReassembler
+from pcap_reader import read_pcap
+from packet_parser import ETH_P_IP, IPPROTO_TCP, parse_ethernet_header, parse_ipv4_header, parse_tcp_header
+
+DEFAULT_FILTER = "ip and tcp"
+
+parser = argparse.ArgumentParser(description="Capture the flags from TCP payloads")
+parser.add_argument("--filter", help=f"kernel-side BPF filter for live capture (default: {DEFAULT_FILTER})")
+parser.add_argument("--read", metavar="FILE", help="replay frames from a pcap/pcapng file instead of sniffing")
+parser.add_argument("--rules", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "payload_rules.txt"),
+                    help="payload patterns, one 'name: pattern' per line (default: payload_rules.txt)")
+parser.add_argument("--reassemble", action="store_true",
+                    help="match over reassembled TCP streams, so patterns split across segments are found")
+args = parser.parse_args()
+if args.read and args.filter:
+    parser.error("--filter only applies to live capture")
+
+# Compile the payload patterns once
+matcher = PayloadMatcher.from_file(args.rules)
+rule_counts = {name: 0 for name, _ in matcher.rules}
+reassembler = StreamReassembler(matcher) if args.reassemble else None
 
 # Initialize variables
 found_ip = "10.1.2.200"
+found_ip_packed = socket.inet_aton(found_ip)
 ip_packet_count = 0
 laptop_name = None
 laptop_packet_checksum = None
 order_successful_count = 0
 
 captured_packets = 0
-# Create raw socket
-sniffer = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.ntohs(ETH_P_ALL))
-
+sniffer = None
+if args.read:
+    frames = read_pcap(args.read)
+else:
+    # Create raw socket
+    sniffer = open_raw_socket()
+    attach_filter(sniffer, args.filter or DEFAULT_FILTER)
+    frames = recv_frames(sniffer)
+
+start = time.time()
 try:
-    while True:
-        raw_data, addr = sniffer.recvfrom(BUFFER_SIZE)
+    for raw_data, _, timestamp in frames:
         captured_packets = captured_packets + 1
-        eth_proto, data = parse_ethernet_header(raw_data)
+        frame = memoryview(raw_data)
+        _, _, eth_proto, offset = parse_ethernet_header(frame)
 
-        if eth_proto == 8:  # IPv4
-            src_ip, dest_ip, proto, data = parse_ipv4_header(data)
+        if eth_proto == ETH_P_IP:  # IPv4
+            _, _, _, proto, src_ip, dest_ip, offset = parse_ipv4_header(frame, offset)
 
-            if proto == 6:  # TCP
-                src_port, dest_port, checksum, payload = parse_tcp_header(data)
+            if proto == IPPROTO_TCP:  # TCP
+                src_port, dest_port, seq, _, flags, checksum, _, offset = parse_tcp_header(frame, offset)
+                payload = frame[offset:]
 
-                # Convert payload to a readable string
-                try:
-                    payload_text = payload.decode(errors="ignore")
-                    payload_text = payload_text.lower()
-                except:
-                    payload_text = ""
+                if reassembler:
+                    hits = reassembler.feed((src_ip, src_port, dest_ip, dest_port), seq, flags, payload, timestamp)
+                else:
+                    hits, _ = matcher.search(payload)
+                for name in hits:
+                    rule_counts[name] += 1
 
-                
                 # Q1: Find the IP Address
-                if "my ip address =" in payload_text:
-                    print(payload_text)
+                if "ip_address" in hits:
+                    print(str(payload, "utf-8", "ignore").lower())
                     print(f"✅ Found IP Address in TCP Packet")
 
                 # Q2: Count packets containing found IP
-                if found_ip and (found_ip == src_ip or found_ip == dest_ip):
+                if found_ip and (found_ip_packed == src_ip or found_ip_packed == dest_ip):
                     ip_packet_count += 1
 
                 # Q3: Find Laptop Name and Checksum
-                if laptop_name is None and "laptop =" in payload_text:
+                if laptop_name is None and "laptop" in hits:
+                    payload_text = str(payload, "utf-8", "ignore").lower()
                     print(payload_text)
                     laptop_name = payload_text
                     print(f"✅ Found Laptop")
                     laptop_packet_checksum = checksum
 
                 # Q4: Count "Order successful" packets
-                if "order successful" in payload_text:
+                if "order_successful" in hits:
                     order_successful_count += 1
 
 except KeyboardInterrupt:
-    print("\n\U0001f6d1 Sniffing stopped.")
-    print(f"\nTotal packets checked = {captured_packets}")
-    print(f"\nQ1. Extracted IP Address: {found_ip}")
-    print(f"Q2. Number of packets with IP {found_ip}: {ip_packet_count}")
-    print(f"Q3a. Laptop Name: {laptop_name}")
-    print(f"Q3b. TCP Checksum of laptop name packet: {laptop_packet_checksum}")
-    print(f"Q4. Number of packets with 'Order successful': {order_successful_count}")
-
+    pass
+
+elapsed = time.time() - start
+print("\n\U0001f6d1 Sniffing stopped.")
+print(f"\nTotal packets checked = {captured_packets} ({captured_packets / max(elapsed, 1e-9):.0f} packets/s)")
+print(f"\nQ1. Extracted IP Address: {found_ip}")
+print(f"Q2. Number of packets with IP {found_ip}: {ip_packet_count}")
+print(f"Q3a. Laptop Name: {laptop_name}")
+print(f"Q3b. TCP Checksum of laptop name packet: {laptop_packet_checksum}")
+print(f"Q4. Number of packets with 'Order successful': {order_successful_count}")
+print("\nPackets matching each payload rule:")
+for name, count in rule_counts.items():
+    print(f"  {name}: {count}")
+if reassembler:
+    print(f"\nReassembly: {len(reassembler.flows)} open flows, {reassembler.buffered_bytes} bytes buffered, "
+          f"{reassembler.expired_flows} expired, {reassembler.evicted_flows} evicted, {reassembler.skipped_gaps} gaps skipped")
+
+if sniffer:
     sniffer.close()
@@ -0,0 +1,73 @@
+# Background writer: the capture loop hands over batches of preformatted
+# records and never waits on the disk or the terminal
+#
+# BatchedWriter was BatchedCSVWriter until it took any writerows() sink
+# instead of a CSV file (for the binary capture format).
+import queue
+import sys
+import threading
+
+
+class BatchedWriter(threading.Thread):
+    """
+    Collect (row, text) records into batches and write them from a separate thread.
+
+    Rows go to sink.writerows (a csv.writer or one of the capture_format writers).
+
+    The queue between the threads is bounded. When it is full the whole batch
+    is dropped and counted in dropped_records instead of blocking the caller,
+    unless lossless is set (offline input, where waiting costs nothing).
+    """
+
+    def __init__(self, sink, batch_size=256, max_batches=1024, flush_interval=0.5, echo=True, lossless=False):
+        super().__init__(daemon=True)
+        self.sink = sink
+        self.lossless = lossless
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.echo = echo
+        self.batches = queue.Queue(maxsize=max_batches)
+        self.rows = []
+        self.lines = []
+        self.last_flush = 0
+        self.written_records = 0
+        self.dropped_records = 0
+        self.start()
+
+    # Called from the capture loop
+    def add(self, row, text=None, timestamp=0):
+        self.rows.append(row)
+        if text is not None and self.echo:
+            self.lines.append(text)
+        if len(self.rows) >= self.batch_size or timestamp - self.last_flush >= self.flush_interval:
+            self.last_flush = timestamp
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        try:
+            self.batches.put((self.rows, self.lines), block=self.lossless)
+        except queue.Full:
+            self.dropped_records += len(self.rows)
+        self.rows = []
+        self.lines = []
+
+    # Writer thread
+    def run(self):
+        while True:
+            batch = self.batches.get()
+            if batch is None:
+                break
+            rows, lines = batch
+            self.sink.writerows(rows)
+            if lines:
+                sys.stdout.write("\n".join(lines) + "\n")
+            self.written_records += len(rows)
+        sys.stdout.flush()
+
+    def close(self):
+        """Write what is still queued and stop the thread."""
+        self.flush()
+        self.batches.put(None)
+        self.join()
@@ -0,0 +1,37 @@
+# Scaling of capture_analyzer --jobs over 1..N processes
+# Run: python3 bench_analyzer.py [--rows 3000000] [--csv FILE] [--max-jobs N]
+import argparse
+import os
+import tempfile
+import time
+
+from bench_keys import make_capture
+from capture_analyzer import analyze
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the capture analyzer with 1..N worker processes")
+    parser.add_argument("--rows", type=int, default=3000000, help="rows of the synthetic capture (default: %(default)s)")
+    parser.add_argument("--csv", help="use an existing fast_sniffer CSV instead of a synthetic one")
+    parser.add_argument("--max-jobs", type=int, default=os.cpu_count(), help="largest pool to try (default: all cores)")
+    args = parser.parse_args()
+
+    path = args.csv
+    if path is None:
+        path = os.path.join(tempfile.gettempdir(), f"bench_keys_{args.rows}.csv")
+        if not os.path.exists(path):
+            print(f"Writing {args.rows} synthetic rows to {path}")
+            make_capture(path, args.rows)
+
+    print(f"{'jobs':>4}{'time (s)':>10}{'rows/s':>12}{'speedup':>9}")
+    baseline = None
+    for jobs in range(1, args.max_jobs + 1):
+        start = time.perf_counter()
+        stats = analyze(path, jobs)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"{jobs:>4}{elapsed:>10.2f}{stats.total_packets / elapsed:>12.0f}{baseline / elapsed:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
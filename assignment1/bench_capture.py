@@ -0,0 +1,87 @@
+# Packets/s comparison of the recvfrom loop and the TPACKET_V3 ring
+# Run as root: sudo python3 bench_capture.py --interface lo --seconds 5
+import argparse
+import multiprocessing
+import socket
+import time
+
+from capture import open_raw_socket, recv_frames, read_packet_stats, RingCapture
+from packet_parser import (ETH_P_IP, ETH_P_IPV6, IPPROTO_TCP, IPPROTO_UDP,
+                           parse_ethernet_header, parse_ipv4_header, parse_ipv6_header, parse_ports)
+
+
+# Blast small UDP datagrams at the loopback address until stopped
+def generate_traffic(stop, port=9999, payload_size=64):
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    payload = b"x" * payload_size
+    while not stop.is_set():
+        for _ in range(1000):
+            sender.sendto(payload, ("127.0.0.1", port))
+    sender.close()
+
+
+# Run the fast_sniffer parse path over the frames for a fixed time
+def measure(frames, seconds):
+    packets = 0
+    deadline = time.time() + seconds
+    for raw_data, packet_size, _ in frames:
+        packets += 1
+        _, _, eth_proto, offset = parse_ethernet_header(raw_data)
+        if eth_proto == ETH_P_IP:
+            _, _, _, proto, src_ip, dest_ip, offset = parse_ipv4_header(raw_data, offset)
+        elif eth_proto == ETH_P_IPV6:
+            _, _, _, _, proto, _, src_ip, dest_ip, offset = parse_ipv6_header(raw_data, offset)
+        else:
+            continue
+        if proto == IPPROTO_TCP or proto == IPPROTO_UDP:
+            parse_ports(raw_data, offset)
+        if (packets & 1023) == 0 and time.time() > deadline:
+            break
+    return packets
+
+
+def run_backend(name, interface, seconds):
+    sniffer = open_raw_socket(interface)
+    ring = None
+    if name == "ring":
+        ring = RingCapture(sniffer)
+        frames = ring.frames()
+    else:
+        frames = recv_frames(sniffer)
+
+    read_packet_stats(sniffer)  # reset the kernel counters
+    start = time.time()
+    packets = measure(frames, seconds)
+    elapsed = time.time() - start
+    _, drops = read_packet_stats(sniffer)
+
+    frames.close()
+    if ring:
+        ring.close()
+    sniffer.close()
+    return packets / elapsed, drops
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare capture backends in packets/s")
+    parser.add_argument("--interface", default="lo")
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    stop = multiprocessing.Event()
+    senders = [multiprocessing.Process(target=generate_traffic, args=(stop,)) for _ in range(2)]
+    for sender in senders:
+        sender.start()
+
+    try:
+        for name in ("recvfrom", "ring"):
+            pps, drops = run_backend(name, args.interface, args.seconds)
+            print(f"{name:>8}: {pps:12.0f} packets/s captured, {drops} dropped by the kernel")
+    finally:
+        stop.set()
+        for sender in senders:
+            sender.join()
+
+
+if __name__ == "__main__":
+    main()
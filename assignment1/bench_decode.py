@@ -0,0 +1,87 @@
+# Per-packet decode cost: slicing + struct.unpack (old sniffers) vs packet_parser
+# Run: python3 bench_decode.py
+import socket
+import struct
+import timeit
+
+from packet_parser import (ETH_P_IP, ETH_P_IPV6, IPPROTO_TCP,
+                           parse_ethernet_header, parse_ipv4_header, parse_ipv6_header, parse_tcp_header)
+
+
+# The decoders the sniffers used before packet_parser, kept here for comparison
+def legacy_ip_format(addr):
+    return ".".join(map(str, addr))
+
+def legacy_ipv6_format(addr):
+    return ":".join(f"{addr[i]:02x}{addr[i+1]:02x}" for i in range(0, 16, 2))
+
+def legacy_parse_ethernet_header(raw_data):
+    _, _, eth_proto = struct.unpack("!6s6sH", raw_data[:14])
+    return socket.htons(eth_proto), raw_data[14:]
+
+def legacy_parse_ipv4_header(raw_data):
+    ip_header = struct.unpack("!BBHHHBBH4s4s", raw_data[:20])
+    header_length = (ip_header[0] & 15) * 4
+    return ip_header[6], legacy_ip_format(ip_header[8]), legacy_ip_format(ip_header[9]), raw_data[header_length:]
+
+def legacy_parse_ipv6_header(raw_data):
+    ipv6_header = struct.unpack("!IHBB16s16s", raw_data[:40])
+    return ipv6_header[2], legacy_ipv6_format(ipv6_header[4]), legacy_ipv6_format(ipv6_header[5]), raw_data[40:]
+
+def legacy_parse_tcp_header(raw_data):
+    tcp_header = struct.unpack("!HHLLBBHHH", raw_data[:20])
+    header_length = (tcp_header[4] >> 4) * 4
+    return tcp_header[0], tcp_header[1], tcp_header[6], raw_data[header_length:]
+
+def legacy_decode(raw_data):
+    eth_proto, data = legacy_parse_ethernet_header(raw_data)
+    if eth_proto == 8:
+        proto, src_ip, dest_ip, data = legacy_parse_ipv4_header(data)
+    elif eth_proto == 0xDD86:
+        proto, src_ip, dest_ip, data = legacy_parse_ipv6_header(data)
+    else:
+        return None
+    if proto == 6:
+        return legacy_parse_tcp_header(data)
+    return None
+
+
+def shared_decode(raw_data):
+    frame = memoryview(raw_data)
+    _, _, eth_proto, offset = parse_ethernet_header(frame)
+    if eth_proto == ETH_P_IP:
+        _, _, _, proto, src_ip, dest_ip, offset = parse_ipv4_header(frame, offset)
+    elif eth_proto == ETH_P_IPV6:
+        _, _, _, _, proto, _, src_ip, dest_ip, offset = parse_ipv6_header(frame, offset)
+    else:
+        return None
+    if proto == IPPROTO_TCP:
+        src_port, dest_port, _, _, _, checksum, _, offset = parse_tcp_header(frame, offset)
+        return src_port, dest_port, checksum, frame[offset:]
+    return None
+
+
+# Build an Ethernet/IP/TCP frame with the given payload size
+def make_frame(payload_size, ipv6=False):
+    tcp = struct.pack("!HHLLBBHHH", 40000, 80, 1, 1, 5 << 4, 0x18, 512, 0, 0) + b"a" * payload_size
+    if ipv6:
+        ip = struct.pack("!IHBB16s16s", 6 << 28, len(tcp), IPPROTO_TCP, 64, bytes(range(16)), bytes(range(16, 32)))
+        eth_proto = ETH_P_IPV6
+    else:
+        ip = struct.pack("!BBHHHBBH4s4s", 0x45, 0, 20 + len(tcp), 0, 0, 64, IPPROTO_TCP, 0,
+                         bytes([10, 0, 0, 1]), bytes([10, 0, 0, 2]))
+        eth_proto = ETH_P_IP
+    return struct.pack("!6s6sH", b"\x00" * 6, b"\x11" * 6, eth_proto) + ip + tcp
+
+
+def main():
+    number = 200000
+    for label, frame in (("IPv4/TCP 64B", make_frame(64)), ("IPv4/TCP 1400B", make_frame(1400)),
+                         ("IPv6/TCP 1400B", make_frame(1400, ipv6=True))):
+        for name, decode in (("slicing", legacy_decode), ("packet_parser", shared_decode)):
+            seconds = min(timeit.repeat(lambda: decode(frame), number=number, repeat=3))
+            print(f"{label:>15} {name:>14}: {seconds / number * 1e9:8.0f} ns/packet")
+
+
+if __name__ == "__main__":
+    main()
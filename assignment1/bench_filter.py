@@ -0,0 +1,78 @@
+# CPU cost of the capture loop at a fixed offered load, with and without a kernel BPF filter
+# Run as root: sudo python3 bench_filter.py --rate 20000 --filter "udp port 53"
+import argparse
+import multiprocessing
+import socket
+import time
+
+from bpf_filter import attach_filter
+from capture import open_raw_socket, read_packet_stats
+from packet_parser import ETH_P_IP, IPPROTO_TCP, IPPROTO_UDP, parse_ethernet_header, parse_ipv4_header, parse_ports
+
+
+# Send UDP datagrams to the loopback address at a fixed rate; every tenth one goes to port 53
+def generate_traffic(stop, rate):
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    payload = b"x" * 64
+    sent = 0
+    start = time.time()
+    while not stop.is_set():
+        due = int((time.time() - start) * rate)
+        while sent < due:
+            sender.sendto(payload, ("127.0.0.1", 53 if sent % 10 == 0 else 9999))
+            sent += 1
+        time.sleep(0.001)
+    sender.close()
+
+
+# Receive and decode for a fixed wall-clock time, return (frames, CPU seconds)
+def measure(filter_expression, interface, seconds):
+    sniffer = open_raw_socket(interface)
+    if filter_expression:
+        attach_filter(sniffer, filter_expression)
+    sniffer.settimeout(0.1)
+    read_packet_stats(sniffer)
+
+    packets = 0
+    deadline = time.time() + seconds
+    cpu_start = time.process_time()
+    while time.time() < deadline:
+        try:
+            raw_data = sniffer.recv(65535)
+        except socket.timeout:
+            continue
+        packets += 1
+        _, _, eth_proto, offset = parse_ethernet_header(raw_data)
+        if eth_proto == ETH_P_IP:
+            _, _, _, proto, _, _, offset = parse_ipv4_header(raw_data, offset)
+            if proto == IPPROTO_TCP or proto == IPPROTO_UDP:
+                parse_ports(raw_data, offset)
+    cpu = time.process_time() - cpu_start
+    _, drops = read_packet_stats(sniffer)
+    sniffer.close()
+    return packets, cpu, drops
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare capture CPU time with and without a BPF filter")
+    parser.add_argument("--interface", default="lo")
+    parser.add_argument("--rate", type=int, default=20000, help="offered load in datagrams/s")
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--filter", default="udp port 53")
+    args = parser.parse_args()
+
+    stop = multiprocessing.Event()
+    sender = multiprocessing.Process(target=generate_traffic, args=(stop, args.rate))
+    sender.start()
+    try:
+        for label, expression in (("no filter", None), (args.filter, args.filter)):
+            packets, cpu, drops = measure(expression, args.interface, args.seconds)
+            print(f"{label:>20}: {packets:9d} frames delivered, {cpu:6.2f} s CPU "
+                  f"({cpu / args.seconds * 100:5.1f}% of one core), {drops} dropped")
+    finally:
+        stop.set()
+        sender.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# Memory and time of the flow_stats/pair_stats dictionaries: string tuple keys vs addr_keys ints
+# Run: python3 bench_keys.py [--rows 3000000] [--csv FILE]
+import argparse
+import csv
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+
+from addr_keys import flow_key, ip_key, port_key
+from capture_format import CSV_HEADER
+
+
+# Write a synthetic capture with a realistic mix of repeated hosts and flows
+def make_capture(path, rows, hosts=5000, flows=300000):
+    rng = random.Random(1)
+    addresses = [f"10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}" for _ in range(hosts)]
+    addresses += [f"2001:0db8:0000:0000:0000:0000:{rng.randrange(65536):04x}:{rng.randrange(65536):04x}"
+                  for _ in range(hosts // 10)]
+    flow_list = []
+    for _ in range(flows):
+        proto = rng.choice(("TCP", "TCP", "UDP", "ICMP"))
+        ports = ("N/A", "N/A") if proto == "ICMP" else (rng.randrange(1024, 65536), rng.choice((53, 80, 443, 8080)))
+        flow_list.append((rng.choice(addresses), rng.choice(addresses), proto) + ports)
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(CSV_HEADER)
+        for _ in range(rows):
+            src_ip, dest_ip, proto, src_port, dest_port = rng.choice(flow_list)
+            writer.writerow([src_ip, dest_ip, proto, src_port, dest_port, rng.randrange(60, 1515)])
+
+
+def read_rows(path):
+    with open(path, newline="") as file:
+        reader = csv.reader(file)
+        next(reader)
+        yield from reader
+
+
+# The dictionaries as flow_stats.py and pair_stats.py used to build them
+def aggregate_strings(path):
+    source_flows = defaultdict(int)
+    dest_flows = defaultdict(int)
+    data_transfer = defaultdict(int)
+    unique_pairs = set()
+    for src_ip, dest_ip, _, src_port, dest_port, packet_size in read_rows(path):
+        source_flows[src_ip] += 1
+        dest_flows[dest_ip] += 1
+        data_transfer[(src_ip, src_port, dest_ip, dest_port)] += int(packet_size)
+        unique_pairs.add((src_ip, src_port, dest_ip, dest_port))
+    return source_flows, dest_flows, data_transfer, unique_pairs
+
+
+# The same with packed integer keys
+def aggregate_ints(path):
+    source_flows = defaultdict(int)
+    dest_flows = defaultdict(int)
+    data_transfer = defaultdict(int)
+    unique_pairs = set()
+    for src_ip, dest_ip, _, src_port, dest_port, packet_size in read_rows(path):
+        src_ip = ip_key(src_ip)
+        dest_ip = ip_key(dest_ip)
+        key = flow_key(src_ip, port_key(src_port), dest_ip, port_key(dest_port))
+        source_flows[src_ip] += 1
+        dest_flows[dest_ip] += 1
+        data_transfer[key] += int(packet_size)
+        unique_pairs.add(key)
+    return source_flows, dest_flows, data_transfer, unique_pairs
+
+
+def measure(aggregate, path):
+    start = time.perf_counter()
+    aggregate(path)
+    elapsed = time.perf_counter() - start
+
+    # Memory of the finished dictionaries (a separate run, tracing slows it down)
+    tracemalloc.start()
+    result = aggregate(path)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return elapsed, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare string and integer keys for the flow statistics")
+    parser.add_argument("--rows", type=int, default=3000000, help="rows of the synthetic capture (default: %(default)s)")
+    parser.add_argument("--csv", help="use an existing fast_sniffer CSV instead of a synthetic one")
+    args = parser.parse_args()
+
+    path = args.csv
+    if path is None:
+        path = os.path.join(tempfile.gettempdir(), f"bench_keys_{args.rows}.csv")
+        if not os.path.exists(path):
+            print(f"Writing {args.rows} synthetic rows to {path}")
+            make_capture(path, args.rows)
+
+    print(f"{'keys':<10}{'time (s)':>10}{'memory (MB)':>14}")
+    for name, aggregate in (("strings", aggregate_strings), ("ints", aggregate_ints)):
+        elapsed, size = measure(aggregate, path)
+        print(f"{name:<10}{elapsed:>10.2f}{size / 1e6:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# Per-payload cost of the payload rules: decode + lower + `in` (old adv_data_sniff) vs payload_matcher
+# Run: python3 bench_matcher.py  (exits with status 1 if the matcher is more than --max-ratio times slower)
+import argparse
+import sys
+import timeit
+
+from payload_matcher import PayloadMatcher
+
+RULES = [("ip_address", "my ip address ="), ("laptop", "laptop ="), ("order_successful", "order successful")]
+
+
+# The matching adv_data_sniff.py did before payload_matcher, kept here for comparison
+def legacy_match(payload):
+    payload_text = payload.decode(errors="ignore").lower()
+    return {name for name, pattern in RULES if pattern in payload_text}
+
+
+# A payload of the given size, with a rule's pattern in the middle when hit is set
+def make_payload(size, hit=False):
+    text = b"GET /index.html HTTP/1.1\r\nHost: example.com\r\nAccept: */*\r\n" * (size // 56 + 1)
+    if hit:
+        middle = size // 2
+        text = text[:middle] + b"Order Successful" + text[middle:]
+    return text[:size]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the payload matcher against the old per-rule scan")
+    parser.add_argument("--max-ratio", type=float, default=3.0,
+                        help="fail if payload_matcher is this many times slower than the old scan (default: %(default)s)")
+    args = parser.parse_args()
+
+    matcher = PayloadMatcher(RULES)
+    number = 100000
+    worst = 0
+    for label, payload in (("1400B no match", make_payload(1400)), ("1400B match", make_payload(1400, hit=True)),
+                           ("64B no match", make_payload(64))):
+        assert legacy_match(payload) == matcher.search(payload)[0]
+        times = {}
+        for name, match in (("decode+lower", lambda: legacy_match(payload)),
+                            ("payload_matcher", lambda: matcher.search(payload)),
+                            ("stream", lambda: matcher.search(payload, 0))):
+            times[name] = min(timeit.repeat(match, number=number, repeat=3)) / number
+            print(f"{label:>15} {name:>15}: {times[name] * 1e6:6.2f} us/payload")
+        worst = max(worst, times["payload_matcher"] / times["decode+lower"])
+
+    print(f"payload_matcher is at most {worst:.2f}x the old scan")
+    if worst > args.max_ratio:
+        print(f"Regression: more than {args.max_ratio:g}x slower than the old scan")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+# Compile small filter expressions into classic BPF and attach them to a socket
+#
+# Supported primitives (frames are assumed to carry an Ethernet header):
+#   ip, ip6, tcp, udp, icmp
+#   [src|dst] host A.B.C.D
+#   [src|dst] port N
+# combined with and / or / not (also &&, ||, !), parentheses and juxtaposition,
+# so "udp port 53" means "udp and port 53".
+#
+# Run: python3 bpf_filter.py "tcp and host 10.1.2.200"   (prints the program)
+import ctypes
+import socket
+import struct
+import sys
+
+from packet_parser import ETH_P_IP, ETH_P_IPV6, IPPROTO_ICMP, IPPROTO_TCP, IPPROTO_UDP
+
+SO_ATTACH_FILTER = 26
+
+# Instruction classes and modes (linux/bpf_common.h)
+BPF_LD = 0x00
+BPF_LDX = 0x01
+BPF_JMP = 0x05
+BPF_RET = 0x06
+BPF_W = 0x00
+BPF_H = 0x08
+BPF_B = 0x10
+BPF_ABS = 0x20
+BPF_IND = 0x40
+BPF_MSH = 0xA0
+BPF_K = 0x00
+BPF_JEQ = 0x10
+BPF_JSET = 0x40
+
+ACCEPT = 0x40000  # Snap length returned for matching frames
+REJECT = 0
+
+SOCK_FILTER = struct.Struct("HBBI")  # code, jt, jf, k
+SOCK_FPROG = struct.Struct("HP")  # len, filter pointer
+
+
+class FilterSyntaxError(ValueError):
+    pass
+
+
+# Expression tree
+class Test:
+    """Run the loads, then jump on (A <op> k)."""
+
+    def __init__(self, loads, op, k):
+        self.loads = loads
+        self.op = op
+        self.k = k
+
+
+class And:
+    def __init__(self, left, right):
+        self.left = left
+        self.right = right
+
+
+class Or:
+    def __init__(self, left, right):
+        self.left = left
+        self.right = right
+
+
+class Not:
+    def __init__(self, operand):
+        self.operand = operand
+
+
+# Loads
+def load_abs(size, offset):
+    return (BPF_LD | size | BPF_ABS, offset)
+
+
+def load_ipv4_header_length():
+    return (BPF_LDX | BPF_B | BPF_MSH, 14)  # X = 4 * ([14] & 0xf)
+
+
+def load_ind(size, offset):
+    return (BPF_LD | size | BPF_IND, offset)
+
+
+# Primitives
+def is_ipv4():
+    return Test([load_abs(BPF_H, 12)], BPF_JEQ, ETH_P_IP)
+
+
+def is_ipv6():
+    return Test([load_abs(BPF_H, 12)], BPF_JEQ, ETH_P_IPV6)
+
+
+def ipv4_proto(proto):
+    return And(is_ipv4(), Test([load_abs(BPF_B, 23)], BPF_JEQ, proto))
+
+
+def ipv6_proto(proto):
+    return And(is_ipv6(), Test([load_abs(BPF_B, 20)], BPF_JEQ, proto))
+
+
+def transport(proto):
+    return Or(ipv4_proto(proto), ipv6_proto(proto))
+
+
+def host(address, direction):
+    try:
+        k = struct.unpack("!I", socket.inet_aton(address))[0]
+    except OSError:
+        raise FilterSyntaxError(f"not an IPv4 address: {address}")
+    src = Test([load_abs(BPF_W, 26)], BPF_JEQ, k)
+    dst = Test([load_abs(BPF_W, 30)], BPF_JEQ, k)
+    match = src if direction == "src" else dst if direction == "dst" else Or(src, dst)
+    return And(is_ipv4(), match)
+
+
+def port(number, direction):
+    if not number.isdigit() or int(number) > 0xFFFF:
+        raise FilterSyntaxError(f"not a port number: {number}")
+    k = int(number)
+
+    # IPv4: skip non-first fragments, then index past the variable-length header
+    src4 = Test([load_ipv4_header_length(), load_ind(BPF_H, 14)], BPF_JEQ, k)
+    dst4 = Test([load_ipv4_header_length(), load_ind(BPF_H, 16)], BPF_JEQ, k)
+    first_fragment = Not(Test([load_abs(BPF_H, 20)], BPF_JSET, 0x1FFF))
+    ipv4 = And(Or(ipv4_proto(IPPROTO_TCP), ipv4_proto(IPPROTO_UDP)),
+               And(first_fragment, pick(src4, dst4, direction)))
+
+    # IPv6: the transport header follows the fixed header (no extension headers)
+    src6 = Test([load_abs(BPF_H, 54)], BPF_JEQ, k)
+    dst6 = Test([load_abs(BPF_H, 56)], BPF_JEQ, k)
+    ipv6 = And(Or(ipv6_proto(IPPROTO_TCP), ipv6_proto(IPPROTO_UDP)), pick(src6, dst6, direction))
+    return Or(ipv4, ipv6)
+
+
+def pick(src, dst, direction):
+    if direction == "src":
+        return src
+    if direction == "dst":
+        return dst
+    return Or(src, dst)
+
+
+# Parser
+def tokenize(expression):
+    for symbol in ("(", ")", "!"):
+        expression = expression.replace(symbol, f" {symbol} ")
+    aliases = {"&&": "and", "||": "or", "!": "not"}
+    return [aliases.get(token, token) for token in expression.split()]
+
+
+class Parser:
+    def __init__(self, expression):
+        self.tokens = tokenize(expression)
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def take(self):
+        token = self.peek()
+        if token is None:
+            raise FilterSyntaxError("unexpected end of expression")
+        self.position += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            raise FilterSyntaxError("empty expression")
+        tree = self.parse_or()
+        if self.peek() is not None:
+            raise FilterSyntaxError(f"unexpected token: {self.peek()}")
+        return tree
+
+    def parse_or(self):
+        tree = self.parse_and()
+        while self.peek() == "or":
+            self.take()
+            tree = Or(tree, self.parse_and())
+        return tree
+
+    def parse_and(self):
+        tree = self.parse_not()
+        while self.peek() not in (None, "or", ")"):
+            if self.peek() == "and":
+                self.take()
+            tree = And(tree, self.parse_not())
+        return tree
+
+    def parse_not(self):
+        token = self.take()
+        if token == "not":
+            return Not(self.parse_not())
+        if token == "(":
+            tree = self.parse_or()
+            if self.take() != ")":
+                raise FilterSyntaxError("missing )")
+            return tree
+        return self.parse_primitive(token)
+
+    def parse_primitive(self, token):
+        direction = None
+        if token in ("src", "dst"):
+            direction, token = token, self.take()
+        if token == "host":
+            return host(self.take(), direction)
+        if token == "port":
+            return port(self.take(), direction)
+        if direction:
+            raise FilterSyntaxError(f"'{direction}' must be followed by host or port")
+        if token == "ip":
+            return is_ipv4()
+        if token == "ip6":
+            return is_ipv6()
+        if token == "tcp":
+            return transport(IPPROTO_TCP)
+        if token == "udp":
+            return transport(IPPROTO_UDP)
+        if token == "icmp":
+            return ipv4_proto(IPPROTO_ICMP)
+        raise FilterSyntaxError(f"unknown primitive: {token}")
+
+
+# Code generation with symbolic jump targets, resolved once the layout is known
+class Label:
+    pass
+
+
+def emit(tree, on_true, on_false, code):
+    if isinstance(tree, Test):
+        for op, k in tree.loads:
+            code.append((op, k, None, None))
+        code.append((BPF_JMP | tree.op | BPF_K, tree.k, on_true, on_false))
+    elif isinstance(tree, And):
+        middle = Label()
+        emit(tree.left, middle, on_false, code)
+        code.append(middle)
+        emit(tree.right, on_true, on_false, code)
+    elif isinstance(tree, Or):
+        middle = Label()
+        emit(tree.left, on_true, middle, code)
+        code.append(middle)
+        emit(tree.right, on_true, on_false, code)
+    else:
+        emit(tree.operand, on_false, on_true, code)
+
+
+def compile_filter(expression):
+    """Return the BPF program for the expression as a list of (code, jt, jf, k)."""
+    accept, reject = Label(), Label()
+    code = []
+    emit(Parser(expression).parse(), accept, reject, code)
+    code += [accept, (BPF_RET | BPF_K, ACCEPT, None, None), reject, (BPF_RET | BPF_K, REJECT, None, None)]
+
+    positions = {}
+    instructions = []
+    for item in code:
+        if isinstance(item, Label):
+            positions[item] = len(instructions)
+        else:
+            instructions.append(item)
+
+    program = []
+    for index, (op, k, on_true, on_false) in enumerate(instructions):
+        jt = jf = 0
+        if on_true is not None:
+            jt = positions[on_true] - index - 1
+            jf = positions[on_false] - index - 1
+            if jt > 255 or jf > 255:
+                raise FilterSyntaxError("expression too long")
+        program.append((op, jt, jf, k))
+    return program
+
+
+# Attach the compiled program; frames it rejects are dropped inside the kernel
+def attach_filter(sniffer, expression):
+    program = compile_filter(expression)
+    buffer = ctypes.create_string_buffer(b"".join(SOCK_FILTER.pack(*instruction) for instruction in program))
+    sniffer.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, SOCK_FPROG.pack(len(program), ctypes.addressof(buffer)))
+
+    # Throw away frames queued before the filter was in place
+    sniffer.setblocking(False)
+    try:
+        while True:
+            sniffer.recv(1)
+    except BlockingIOError:
+        pass
+    sniffer.setblocking(True)
+    return program
+
+
+if __name__ == "__main__":
+    for index, (op, jt, jf, k) in enumerate(compile_filter(" ".join(sys.argv[1:]))):
+        print(f"({index:03d}) code={op:#06x} jt={jt:<3} jf={jf:<3} k={k:#x}")
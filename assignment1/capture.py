@@ -0,0 +1,122 @@
+# Capture backends shared by the sniffers
+import mmap
+import select
+import socket
+import struct
+import time
+
+# Define constants
+ETH_P_ALL = 0x0003  # Capture all protocols
+BUFFER_SIZE = 65535
+
+# Linux packet socket options (linux/if_packet.h)
+SOL_PACKET = 263
+PACKET_RX_RING = 5
+PACKET_STATISTICS = 6
+PACKET_VERSION = 10
+PACKET_FANOUT = 18
+TPACKET_V3 = 2
+
+# Fanout modes
+PACKET_FANOUT_HASH = 0  # Pick the socket by flow hash, so a flow always lands on the same socket
+
+# Block status bits
+TP_STATUS_KERNEL = 0
+TP_STATUS_USER = 1
+
+# struct tpacket_req3: block_size, block_nr, frame_size, frame_nr, retire_blk_tov, sizeof_priv, feature_req_word
+TPACKET_REQ3 = struct.Struct("=IIIIIII")
+# struct tpacket_block_desc: version, offset_to_priv, then tpacket_hdr_v1 (block_status, num_pkts, offset_to_first_pkt)
+BLOCK_STATUS_OFFSET = 8
+BLOCK_STATUS = struct.Struct("=I")
+BLOCK_PACKETS = struct.Struct("=II")  # num_pkts, offset_to_first_pkt
+# struct tpacket3_hdr: next_offset, sec, nsec, snaplen, len, status, mac, net
+FRAME_HEADER = struct.Struct("=IIIIIIHH")
+# struct tpacket_stats: packets, drops
+PACKET_STATS = struct.Struct("=II")
+
+
+# Create a raw socket receiving every frame on every interface
+def open_raw_socket(interface=None):
+    sniffer = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.ntohs(ETH_P_ALL))
+    if interface:
+        sniffer.bind((interface, 0))
+    return sniffer
+
+
+# Join a fanout group; the kernel spreads the group's traffic across its sockets
+def join_fanout(sniffer, group_id, mode=PACKET_FANOUT_HASH):
+    sniffer.setsockopt(SOL_PACKET, PACKET_FANOUT, (group_id & 0xFFFF) | (mode << 16))
+
+
+# Read the kernel counters (packets seen, packets dropped) since the last call
+def read_packet_stats(sniffer):
+    stats = sniffer.getsockopt(SOL_PACKET, PACKET_STATISTICS, 12)
+    return PACKET_STATS.unpack_from(stats)
+
+
+# One recvfrom syscall per frame
+def recv_frames(sniffer):
+    """Yield (frame, packet size, timestamp) tuples read with recvfrom."""
+    while True:
+        raw_data, _ = sniffer.recvfrom(BUFFER_SIZE)
+        yield raw_data, len(raw_data), time.time()
+
+
+class RingCapture:
+    """
+    TPACKET_V3 receive ring mapped into our address space.
+
+    The kernel fills whole blocks of frames and hands each block over by
+    flipping its status word, so we only enter the kernel (poll) when no
+    block is ready. Frames are yielded as memoryviews into the ring; they
+    are only valid until the generator moves on to the next block.
+    """
+
+    def __init__(self, sniffer, block_size=1 << 20, block_nr=64, frame_size=1 << 11, retire_tov=60):
+        self.sniffer = sniffer
+        self.block_size = block_size
+        self.block_nr = block_nr
+        self.retire_tov = retire_tov
+
+        frame_nr = (block_size // frame_size) * block_nr
+        sniffer.setsockopt(SOL_PACKET, PACKET_VERSION, TPACKET_V3)
+        sniffer.setsockopt(SOL_PACKET, PACKET_RX_RING,
+                           TPACKET_REQ3.pack(block_size, block_nr, frame_size, frame_nr, retire_tov, 0, 0))
+
+        self.ring = mmap.mmap(sniffer.fileno(), block_size * block_nr,
+                              mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+        self.view = memoryview(self.ring)
+        self.poller = select.poll()
+        self.poller.register(sniffer.fileno(), select.POLLIN | select.POLLERR)
+
+    def frames(self):
+        """Yield (frame, packet size, timestamp) tuples block by block."""
+        view = self.view
+        block = 0
+        while True:
+            block_offset = block * self.block_size
+            status_offset = block_offset + BLOCK_STATUS_OFFSET
+            if not BLOCK_STATUS.unpack_from(view, status_offset)[0] & TP_STATUS_USER:
+                # Nothing ready, sleep until the kernel retires a block
+                self.poller.poll(self.retire_tov)
+                continue
+
+            num_pkts, first_offset = BLOCK_PACKETS.unpack_from(view, status_offset + 4)
+            frame_offset = block_offset + first_offset
+            for _ in range(num_pkts):
+                next_offset, sec, nsec, snaplen, length, _, mac, _ = FRAME_HEADER.unpack_from(view, frame_offset)
+                start = frame_offset + mac
+                yield view[start:start + snaplen], length, sec + nsec * 1e-9
+                frame_offset += next_offset
+
+            # Hand the block back to the kernel
+            BLOCK_STATUS.pack_into(view, status_offset, TP_STATUS_KERNEL)
+            block = (block + 1) % self.block_nr
+
+    def close(self):
+        try:
+            self.view.release()
+            self.ring.close()
+        except BufferError:
+            pass  # A caller still holds a frame, the mapping goes away with the process
@@ -0,0 +1,396 @@
+# Single-pass analysis of a fast_sniffer capture
+#
+# The capture is streamed once and every statistic the Part 1 questions need
+# is updated per row: running size aggregates, a count per distinct packet
+# size (at most 65536 entries) for the histogram, per-IP flow counts and
+# bytes per (src ip, src port, dest ip, dest port) pair, keyed by addr_keys
+# ints. data_stats.py, pair_stats.py and flow_stats.py print parts of it.
+#
+# A large CSV can also be split into byte ranges on line boundaries and
+# analyzed by a pool of processes; the partial CaptureStats are then merged.
+# --backend numpy computes the same CaptureStats with vector_stats.py, and
+# --sketch swaps in the fixed-memory SketchStats from sketches.py.
+#
+# --cache keeps a memory-mapped columnar copy of a CSV next to it (see
+# capture_cache.py), so later runs skip the text parsing.
+#
+# --follow tails a CSV that fast_sniffer is still writing, adding each new
+# complete line to the same stats and printing a summary every few seconds.
+import argparse
+import csv
+import heapq
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from addr_keys import NO_PORT, flow_key, format_flow_key, format_ip_key, ip_key, packed_ip_key, port_key
+from capture_format import iter_capture
+from sketches import SketchStats, print_sketch_stats
+
+CSV_FILENAME = "fast_captured_packets_info.csv"
+PLOT_FILENAME = "Packet_Size_dist"
+HISTOGRAM_BINS = 20
+BLOCK_SIZE = 8 << 20  # Bytes a worker decodes at a time
+
+
+class CaptureStats:
+    def __init__(self):
+        self.total_data = 0
+        self.total_packets = 0
+        self.min_size = None
+        self.max_size = None
+        self.size_counts = {}
+        self.source_flows = {}
+        self.dest_flows = {}
+        self.data_transfer = {}  # flow key -> bytes, its keys are also the unique pairs
+
+    def add(self, src_ip, src_port, dest_ip, dest_port, packet_size):
+        self.total_data += packet_size
+        self.total_packets += 1
+        if self.min_size is None or packet_size < self.min_size:
+            self.min_size = packet_size
+        if self.max_size is None or packet_size > self.max_size:
+            self.max_size = packet_size
+        size_counts = self.size_counts
+        size_counts[packet_size] = size_counts.get(packet_size, 0) + 1
+
+        source_flows = self.source_flows
+        source_flows[src_ip] = source_flows.get(src_ip, 0) + 1
+        dest_flows = self.dest_flows
+        dest_flows[dest_ip] = dest_flows.get(dest_ip, 0) + 1
+        key = flow_key(src_ip, src_port, dest_ip, dest_port)
+        data_transfer = self.data_transfer
+        data_transfer[key] = data_transfer.get(key, 0) + packet_size
+
+    def merge(self, other):
+        """Add the counts of another CaptureStats (e.g. from another chunk) to this one."""
+        self.total_data += other.total_data
+        self.total_packets += other.total_packets
+        for name in ("min_size", "max_size"):
+            mine, theirs = getattr(self, name), getattr(other, name)
+            if theirs is not None and (mine is None or (theirs < mine if name == "min_size" else theirs > mine)):
+                setattr(self, name, theirs)
+        for name in ("size_counts", "source_flows", "dest_flows", "data_transfer"):
+            counts = getattr(self, name)
+            for key, count in getattr(other, name).items():
+                counts[key] = counts.get(key, 0) + count
+        return self
+
+
+# Function to find the columns the analysis needs from the CSV header
+def header_indices(header):
+    columns = ("Src IP", "Dest IP", "Src Port", "Dest Port", "Packet Size")
+    missing = [name for name in columns if name not in header]
+    if missing:
+        raise ValueError(f"capture CSV has no {', '.join(missing)} column")
+    return [header.index(name) for name in columns]
+
+
+def analyze_csv(path, stats=None):
+    stats = stats or CaptureStats()
+    add = stats.add
+    with open(path, mode="r", newline="") as file:
+        reader = csv.reader(file)
+        src_index, dest_index, src_port_index, dest_port_index, size_index = header_indices(next(reader))
+        for row in reader:
+            add(ip_key(row[src_index]), port_key(row[src_port_index]),
+                ip_key(row[dest_index]), port_key(row[dest_port_index]), int(row[size_index]))
+    return stats
+
+
+# Split the rows after the header into about jobs byte ranges that start and end on a line boundary
+def chunk_ranges(path, jobs):
+    size = os.path.getsize(path)
+    with open(path, "rb") as file:
+        file.readline()
+        boundaries = [file.tell()]
+        for index in range(1, jobs):
+            position = boundaries[0] + (size - boundaries[0]) * index // jobs
+            if position <= boundaries[-1]:
+                continue
+            file.seek(position - 1)
+            file.readline()  # Finish the line the position falls in
+            if boundaries[-1] < file.tell() < size:
+                boundaries.append(file.tell())
+        boundaries.append(size)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+# Worker: analyze the complete lines in [start, end) of the CSV
+def analyze_csv_range(path, start, end, indices, sketch=False):
+    stats = SketchStats() if sketch else CaptureStats()
+    add = stats.add
+    src_index, dest_index, src_port_index, dest_port_index, size_index = indices
+    with open(path, "rb") as file:
+        file.seek(start)
+        position = start
+        while position < end:
+            block = file.read(min(BLOCK_SIZE, end - position))
+            if not block.endswith(b"\n") and position + len(block) < end:
+                block += file.readline()  # Never split a row between blocks
+            position += len(block)
+            for row in csv.reader(block.decode().splitlines()):
+                add(ip_key(row[src_index]), port_key(row[src_port_index]),
+                    ip_key(row[dest_index]), port_key(row[dest_port_index]), int(row[size_index]))
+    return stats
+
+
+# Function to analyze a CSV with jobs processes and merge their partial results
+def analyze_csv_parallel(path, jobs, sketch=False):
+    with open(path, mode="r", newline="") as file:
+        indices = header_indices(next(csv.reader(file)))
+    ranges = chunk_ranges(path, jobs)
+    stats = SketchStats() if sketch else CaptureStats()
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(analyze_csv_range, path, start, end, indices, sketch) for start, end in ranges]
+        for future in futures:
+            stats.merge(future.result())
+    return stats
+
+
+def analyze_binary(path, stats=None):
+    stats = stats or CaptureStats()
+    add = stats.add
+    for src_ip, dest_ip, _, src_port, dest_port, packet_size in iter_capture(path):
+        if src_port is None:
+            src_port = dest_port = NO_PORT
+        add(packed_ip_key(src_ip), src_port, packed_ip_key(dest_ip), dest_port, packet_size)
+    return stats
+
+
+# Function to run the vectorized backend (through the columnar cache with cache=True): a
+# vector_stats.ColumnStats, or None when the Python backend applies
+def analyze_vectorized(path, backend="python", cache=False):
+    if cache and not path.endswith(".bin"):
+        try:
+            from vector_stats import analyze_cached_columns
+        except ImportError:  # No numpy/pandas: parse the CSV as usual
+            return None
+        return analyze_cached_columns(path)
+    if backend == "numpy":
+        from vector_stats import analyze_columns
+        return analyze_columns(path)
+    return None
+
+
+# Function to analyze a CSV or (.bin) binary capture in one pass
+def analyze(path, jobs=1, backend="python", sketch=False, cache=False):
+    if not sketch:
+        columns = analyze_vectorized(path, backend, cache)
+        if columns is not None:
+            return columns.to_capture_stats()
+    stats = SketchStats() if sketch else None
+    if path.endswith(".bin"):
+        return analyze_binary(path, stats)
+    return analyze_csv_parallel(path, jobs, sketch) if jobs > 1 else analyze_csv(path, stats)
+
+
+# Function to tell whether the CSV at path is no longer the file open as file (replaced or truncated)
+def file_replaced(file, path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return False  # Moved away and not recreated yet: keep reading the old one
+    return stat.st_ino != os.fstat(file.fileno()).st_ino or stat.st_size < file.tell()
+
+
+# Function to open the CSV once it exists and has a complete header line: (file, column indices)
+def open_when_ready(path, poll):
+    while True:
+        try:
+            file = open(path, "rb")
+        except FileNotFoundError:  # The sniffer has not created it yet
+            time.sleep(poll)
+            continue
+        header = file.readline()
+        while not header.endswith(b"\n") and not file_replaced(file, path):
+            time.sleep(poll)
+            header += file.readline()
+        if header.endswith(b"\n"):
+            return file, header_indices(next(csv.reader([header.decode()])))
+        file.close()
+
+
+# Function to tail a CSV like tail -f, calling report(stats) every interval seconds until Ctrl+C
+def follow_csv(path, stats_factory, report, interval=5.0, poll=0.2):
+    stats = stats_factory()
+    file = None
+    try:
+        file, indices = open_when_ready(path, poll)
+        partial = b""
+        next_report = time.monotonic() + interval
+        while True:
+            block = file.read(BLOCK_SIZE)
+            if block:
+                src_index, dest_index, src_port_index, dest_port_index, size_index = indices
+                block = partial + block
+                end = block.rfind(b"\n") + 1
+                partial = block[end:]  # Keep a line still being written for the next read
+                add = stats.add
+                for row in csv.reader(block[:end].decode().splitlines()):
+                    add(ip_key(row[src_index]), port_key(row[src_port_index]),
+                        ip_key(row[dest_index]), port_key(row[dest_port_index]), int(row[size_index]))
+            elif file_replaced(file, path):  # A new capture: start over on the new file
+                file.close()
+                file = None
+                file, indices = open_when_ready(path, poll)
+                partial = b""
+                stats = stats_factory()
+            else:
+                time.sleep(poll)
+            if time.monotonic() >= next_report:
+                report(stats)
+                next_report = time.monotonic() + interval
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if file is not None:
+            file.close()
+    return stats
+
+
+def print_follow_summary(stats, top=5):
+    print(f"--- {time.strftime('%H:%M:%S')} ---")
+    print_size_stats(stats)
+    print(f"Number of unique pairs: {len(stats.data_transfer)}")
+    print(f"Source IPs: {len(stats.source_flows)}, Destination IPs: {len(stats.dest_flows)}")
+    print_top_pairs(stats, top)
+    print(flush=True)
+
+
+def print_size_stats(stats):
+    print(f"Total Data Transferred: {stats.total_data} bytes")
+    print(f"Total Packets Transferred: {stats.total_packets}")
+    print(f"Minimum Packet Size: {stats.min_size} bytes")
+    print(f"Maximum Packet Size: {stats.max_size} bytes")
+    print(f"Average Packet Size: {stats.total_data / max(stats.total_packets, 1):.2f} bytes")
+
+
+def print_pair_stats(stats, print_all=False):
+    print(f"Number of unique pairs: {len(stats.data_transfer)}")
+    if print_all:
+        for pair in stats.data_transfer:
+            src_ip, src_port, dest_ip, dest_port = format_flow_key(pair)
+            print(f"Source: {src_ip}:{src_port} -> Destination: {dest_ip}:{dest_port}")
+
+
+def print_flow_stats(stats, print_all=False):
+    print("Source IP Flows:")
+    print(f"Total Number of Ip address source flows {len(stats.source_flows)}")
+    if print_all:
+        for ip, count in stats.source_flows.items():
+            print(f"{format_ip_key(ip)}: {count} flows")
+
+    print("\nDestination IP Flows:")
+    print(f"Total Number of Ip address destination flows {len(stats.dest_flows)}")
+    if print_all:
+        for ip, count in stats.dest_flows.items():
+            print(f"{format_ip_key(ip)}: {count} flows")
+
+    # Find the source-destination pair with the most data transferred
+    if stats.data_transfer:
+        max_data_pair = max(stats.data_transfer, key=stats.data_transfer.get)
+        print(f"\nSource-Destination Pair with Most Data Transferred: {format_flow_key(max_data_pair)}")
+        print(f"Total Data Transferred: {stats.data_transfer[max_data_pair]} bytes")
+
+
+# Function to list the top pairs, ranked on the grouped pair table when the numpy backend's columns are given
+def print_top_pairs(stats, count, columns=None):
+    if columns is not None:
+        pairs = columns.top_pairs(count)
+    else:
+        pairs = heapq.nlargest(count, stats.data_transfer.items(), key=lambda item: item[1])
+    print(f"Top {count} Source-Destination Pairs by Data Transferred:")
+    for pair, size in pairs:
+        src_ip, src_port, dest_ip, dest_port = format_flow_key(pair)
+        print(f"  {src_ip}:{src_port} -> {dest_ip}:{dest_port}  {size} bytes")
+
+
+# Function to list the statistics where two results differ
+def compare_stats(first, second):
+    return [name for name, value in vars(first).items() if vars(second)[name] != value]
+
+
+# Plot packet size distribution (the same 20 bins as a histogram of every size)
+def plot_size_distribution(stats, filename=PLOT_FILENAME):
+    import matplotlib.pyplot as plt
+
+    sizes = list(stats.size_counts)
+    plt.hist(sizes, bins=HISTOGRAM_BINS, weights=[stats.size_counts[size] for size in sizes], edgecolor='black')
+    plt.title("Packet Size Distribution")
+    plt.xlabel("Packet Size (bytes)")
+    plt.ylabel("Frequency")
+    plt.savefig(filename)
+    plt.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Packet size, pair and flow statistics of a capture in one pass")
+    parser.add_argument("capture", nargs="?", default=CSV_FILENAME,
+                        help="fast_sniffer CSV or .bin capture (default: %(default)s)")
+    parser.add_argument("--plot", metavar="FILE", nargs="?", const=PLOT_FILENAME,
+                        help="save the packet size histogram (default file: %(const)s.png)")
+    parser.add_argument("--print-all", action="store_true", help="also list every pair and per-IP flow count")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="split a CSV capture into this many line-aligned chunks analyzed in parallel")
+    parser.add_argument("--backend", choices=("python", "numpy"),
+                        help="numpy: vectorized NumPy/pandas version of the same statistics (default: python)")
+    parser.add_argument("--check", action="store_true", help="run both backends and report any difference")
+    parser.add_argument("--top", type=int, default=0, metavar="N", help="list the N pairs with the most data")
+    parser.add_argument("--sketch", action="store_true",
+                        help="fixed memory: HyperLogLog distinct counts and Space-Saving top pairs, with error bounds")
+    parser.add_argument("--cache", action="store_true",
+                        help="read a CSV through its sidecar columnar cache, building or extending it as needed")
+    parser.add_argument("--follow", action="store_true",
+                        help="tail a CSV that is still being written and print a summary every --interval seconds")
+    parser.add_argument("--interval", type=float, default=5.0, help="seconds between --follow summaries")
+    args = parser.parse_args()
+    if args.follow and (args.capture.endswith(".bin") or args.jobs > 1 or args.backend == "numpy"
+                        or args.check or args.cache):
+        parser.error("--follow needs a CSV capture and cannot be combined with --jobs, --backend numpy, "
+                     "--check or --cache")
+    if args.sketch and (args.backend == "numpy" or args.check or args.plot or args.cache):
+        parser.error("--sketch cannot be combined with --backend numpy, --check, --plot or --cache")
+    if args.cache and (args.capture.endswith(".bin") or args.jobs > 1 or args.backend == "python" or args.check):
+        parser.error("--cache reads a CSV with the numpy backend and cannot be combined with --jobs, "
+                     "--backend python or --check")
+
+    columns = None
+    if args.follow:
+        top = args.top or 5
+        if args.sketch:
+            stats = follow_csv(args.capture, SketchStats, lambda stats: print_sketch_stats(stats, top), args.interval)
+            print()
+            print_sketch_stats(stats, top)
+            return
+        stats = follow_csv(args.capture, CaptureStats, lambda stats: print_follow_summary(stats, top), args.interval)
+        print()
+    elif args.sketch:
+        print_sketch_stats(analyze(args.capture, args.jobs, sketch=True), args.top or 10)
+        return
+    else:
+        columns = analyze_vectorized(args.capture, args.backend, args.cache)
+        stats = columns.to_capture_stats() if columns is not None else analyze(args.capture, args.jobs)
+
+    print_size_stats(stats)
+    print()
+    print_pair_stats(stats, args.print_all)
+    print()
+    print_flow_stats(stats, args.print_all)
+    if args.top:
+        print()
+        print_top_pairs(stats, args.top, columns)
+    if args.check:
+        other = analyze(args.capture, args.jobs, "python" if args.backend == "numpy" else "numpy")
+        differences = compare_stats(stats, other)
+        if differences:
+            print(f"\nBackends disagree on: {', '.join(differences)}")
+            sys.exit(1)
+        print("\nThe python and numpy backends agree.")
+    if args.plot:
+        plot_size_distribution(stats, args.plot)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+# Sidecar columnar cache of a capture CSV
+#
+# The first analysis of capture.csv parses it once into capture.csv.cache/:
+#   src_ip.i32, dest_ip.i32    address codes (line numbers in addresses.txt)
+#   src_port.i32, dest_port.i32  ports, N/A as addr_keys.NO_PORT
+#   protocol.u8                codes into meta.json "protocols"
+#   size.u32                   packet sizes
+#   meta.json                  row count, parsed byte offset, source size/mtime
+#                              and a fingerprint of the first and last 1 MB of
+#                              the parsed bytes (a sample: a rewrite in between
+#                              is not detected)
+# Later runs memory-map the columns. If the CSV only grew (fast_sniffer still
+# appending), just the new complete lines are parsed and appended; any other
+# change rebuilds the cache. meta.json is written last, so a run that dies
+# halfway leaves the previous cache valid.
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from addr_keys import NO_PORT
+
+CACHE_VERSION = 1
+CHUNK_ROWS = 1 << 20
+FINGERPRINT_BYTES = 1 << 20
+COLUMNS = {"src_ip": np.int32, "dest_ip": np.int32, "src_port": np.int32, "dest_port": np.int32,
+           "protocol": np.uint8, "size": np.uint32}
+CSV_COLUMNS = {"Src IP": "src_ip", "Dest IP": "dest_ip", "Src Port": "src_port", "Dest Port": "dest_port",
+               "Protocol": "protocol", "Packet Size": "size"}
+EXTENSIONS = {np.int32: "i32", np.uint8: "u8", np.uint32: "u32"}
+
+
+def cache_dir(path):
+    return path + ".cache"
+
+
+def column_path(directory, name):
+    return os.path.join(directory, f"{name}.{EXTENSIONS[COLUMNS[name]]}")
+
+
+# Function to fingerprint the parsed part of the source without hashing all of it:
+# the header and first bytes, and the bytes just before the parsed offset
+def fingerprint(path, parsed_bytes):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as file:
+        digest.update(file.read(min(FINGERPRINT_BYTES, parsed_bytes)))
+        tail_start = max(parsed_bytes - FINGERPRINT_BYTES, 0)
+        file.seek(tail_start)
+        digest.update(file.read(parsed_bytes - tail_start))
+    return digest.hexdigest()
+
+
+# Offset just past the last complete line (a line still being written is left for later)
+def complete_length(path):
+    size = os.path.getsize(path)
+    with open(path, "rb") as file:
+        position = size
+        while position > 0:
+            start = max(position - 65536, 0)
+            file.seek(start)
+            block = file.read(position - start)
+            newline = block.rfind(b"\n")
+            if newline >= 0:
+                return start + newline + 1
+            position = start
+    return 0
+
+
+class RangeReader:
+    """File-like view of bytes [start, end) of a file, for pandas.read_csv."""
+
+    def __init__(self, file, start, end):
+        self.file = file
+        self.remaining = end - start
+        file.seek(start)
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self.file.readline(self.remaining) if self.remaining else b""
+        if not line:
+            raise StopIteration
+        self.remaining -= len(line)
+        return line
+
+
+class CachedCapture:
+    def __init__(self, directory, meta, addresses):
+        self.meta = meta
+        self.rows = meta["rows"]
+        self.addresses = addresses
+        self.protocols = meta["protocols"]
+        self.status = None  # "hit", "tail" or "full" after load_cached_capture
+        for name, dtype in COLUMNS.items():
+            if self.rows:
+                column = np.memmap(column_path(directory, name), dtype=dtype, mode="r", shape=(self.rows,))
+            else:
+                column = np.empty(0, dtype=dtype)
+            setattr(self, name, column)
+
+
+def read_meta(directory):
+    try:
+        with open(os.path.join(directory, "meta.json")) as file:
+            meta = json.load(file)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get("version") == CACHE_VERSION else None
+
+
+def read_addresses(directory, count):
+    with open(os.path.join(directory, "addresses.txt")) as file:
+        return [line.rstrip("\n") for _, line in zip(range(count), file)]
+
+
+# Parse source bytes [start, end) and append the rows to the cache files
+def append_rows(path, directory, header, start, end, meta, addresses):
+    address_codes = {address: code for code, address in enumerate(addresses)}
+    protocols = meta["protocols"]
+    protocol_codes = {name: code for code, name in enumerate(protocols)}
+    names = [CSV_COLUMNS.get(column, column) for column in header]
+
+    # Drop anything a previous interrupted run appended past the recorded rows
+    for name in COLUMNS:
+        with open(column_path(directory, name), "ab") as column_file:
+            column_file.truncate(meta["rows"] * np.dtype(COLUMNS[name]).itemsize)
+    with open(os.path.join(directory, "addresses.txt"), "a") as address_file:
+        address_file.truncate(sum(len(address) + 1 for address in addresses))
+
+    files = {name: open(column_path(directory, name), "ab") for name in COLUMNS}
+    try:
+        with open(path, "rb") as source, open(os.path.join(directory, "addresses.txt"), "a") as address_file:
+            chunks = pd.read_csv(RangeReader(source, start, end), header=None, names=names,
+                                 usecols=list(COLUMNS), dtype={"src_ip": str, "dest_ip": str, "protocol": str},
+                                 na_values={"src_port": ["N/A"], "dest_port": ["N/A"]}, keep_default_na=False,
+                                 chunksize=CHUNK_ROWS)
+            for chunk in chunks:
+                columns = {}
+                for name in ("src_ip", "dest_ip"):
+                    inverse, uniques = pd.factorize(chunk[name])
+                    codes = np.empty(len(uniques), dtype=np.int32)
+                    for position, address in enumerate(uniques):
+                        code = address_codes.get(address)
+                        if code is None:
+                            code = address_codes[address] = len(addresses)
+                            addresses.append(address)
+                            address_file.write(address + "\n")
+                        codes[position] = code
+                    columns[name] = codes[inverse]
+                for name in ("src_port", "dest_port"):
+                    columns[name] = chunk[name].fillna(NO_PORT).to_numpy(np.int32)
+                inverse, uniques = pd.factorize(chunk["protocol"])
+                for name in uniques:
+                    if name not in protocol_codes:
+                        protocol_codes[name] = len(protocols)
+                        protocols.append(name)
+                columns["protocol"] = np.array([protocol_codes[name] for name in uniques], dtype=np.uint8)[inverse]
+                columns["size"] = chunk["size"].to_numpy(np.uint32)
+                for name, dtype in COLUMNS.items():
+                    files[name].write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+                meta["rows"] += len(chunk)
+    finally:
+        for file in files.values():
+            file.close()
+
+
+def load_cached_capture(path):
+    """Return a CachedCapture for the CSV at path, building or extending its cache when needed."""
+    directory = cache_dir(path)
+    meta = read_meta(directory)
+    stat = os.stat(path)
+
+    if meta and meta["source_size"] == stat.st_size and meta["source_mtime_ns"] == stat.st_mtime_ns:
+        status = "hit"
+    elif meta and stat.st_size >= meta["parsed_bytes"] and fingerprint(path, meta["parsed_bytes"]) == meta["fingerprint"]:
+        status = "tail"
+    else:
+        status = "full"
+
+    if status != "hit":
+        end = complete_length(path)
+        with open(path, "rb") as file:
+            header = file.readline().decode().rstrip("\r\n").split(",")
+            header_end = file.tell()
+        if status == "full":
+            os.makedirs(directory, exist_ok=True)
+            meta = {"version": CACHE_VERSION, "rows": 0, "parsed_bytes": header_end, "protocols": [], "addresses": 0}
+            addresses = []
+        else:
+            addresses = read_addresses(directory, meta["addresses"])
+        if end > meta["parsed_bytes"]:
+            append_rows(path, directory, header, meta["parsed_bytes"], end, meta, addresses)
+            meta["parsed_bytes"] = end
+        meta.update(addresses=len(addresses), source_size=stat.st_size, source_mtime_ns=stat.st_mtime_ns,
+                    fingerprint=fingerprint(path, meta["parsed_bytes"]))
+        temporary = os.path.join(directory, "meta.json.tmp")
+        with open(temporary, "w") as file:
+            json.dump(meta, file)
+        os.replace(temporary, os.path.join(directory, "meta.json"))
+    else:
+        addresses = read_addresses(directory, meta["addresses"])
+
+    capture = CachedCapture(directory, meta, addresses)
+    capture.status = status
+    return capture
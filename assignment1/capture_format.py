@@ -0,0 +1,162 @@
+# Output formats for captured packet records
+#
+# A record is (src_ip, dest_ip, proto, src_port, dest_port, packet_size), with
+# the addresses packed (4 or 16 bytes, network order) as the parsers return
+# them, proto the IP protocol number and the ports None when the protocol has
+# none. Addresses are only turned into text by the CSV writer.
+#
+# Binary format: fixed-width little-endian records after a 16-byte header,
+# one file per address family so IPv4 records stay at 4-byte addresses:
+#   capture.bin     IPv4 records (18 bytes)
+#   capture.v6.bin  IPv6 records (42 bytes)
+# Both load straight into NumPy structured arrays with np.memmap.
+import csv
+import os
+import shutil
+import struct
+
+from packet_parser import address_format
+
+PROTOCOL_NAMES = {1: "ICMP", 2: "IGMP", 6: "TCP", 17: "UDP"}
+PROTOCOL_NUMBERS = {name: number for number, name in PROTOCOL_NAMES.items()}
+CSV_HEADER = ["Src IP", "Dest IP", "Protocol", "Src Port", "Dest Port", "Packet Size"]
+
+# Header: magic, version, address family, record size, reserved
+MAGIC = b"PKTCAP"
+VERSION = 1
+FILE_HEADER = struct.Struct("<6sBBH6x")
+
+# Records: src, dst (network byte order), src port, dest port, size, protocol, flags
+FLAG_PORTS = 0x01
+RECORD_V4 = struct.Struct("<4s4sHHIBB")
+RECORD_V6 = struct.Struct("<16s16sHHIBB")
+
+CHUNK_RECORDS = 4096
+
+
+def protocol_name(proto):
+    return PROTOCOL_NAMES.get(proto, "Other")
+
+
+def v6_path(path):
+    root, ext = os.path.splitext(path)
+    return f"{root}.v6{ext}"
+
+
+# Write records as the CSV layout the analysis scripts read
+class CSVCaptureWriter:
+    def __init__(self, file):
+        self.writer = csv.writer(file)
+        self.writer.writerow(CSV_HEADER)
+
+    def writerows(self, records):
+        na = "N/A"
+        self.writer.writerows(
+            [address_format(src_ip), address_format(dest_ip), protocol_name(proto),
+             na if src_port is None else src_port, na if dest_port is None else dest_port, packet_size]
+            for src_ip, dest_ip, proto, src_port, dest_port, packet_size in records)
+
+    def close(self):
+        pass
+
+
+# Write records in the binary format, packing them into chunks before each write
+class BinaryCaptureWriter:
+    def __init__(self, path):
+        self.files = {4: open(path, "wb"), 6: open(v6_path(path), "wb")}
+        self.chunks = {4: bytearray(), 6: bytearray()}
+        for family, record in ((4, RECORD_V4), (6, RECORD_V6)):
+            self.files[family].write(FILE_HEADER.pack(MAGIC, VERSION, family, record.size))
+
+    def writerows(self, records):
+        chunk_v4 = self.chunks[4]
+        chunk_v6 = self.chunks[6]
+        for src_ip, dest_ip, proto, src_port, dest_port, packet_size in records:
+            flags = FLAG_PORTS if src_port is not None else 0
+            if len(src_ip) == 16:
+                chunk_v6 += RECORD_V6.pack(src_ip, dest_ip, src_port or 0, dest_port or 0, packet_size, proto, flags)
+            else:
+                chunk_v4 += RECORD_V4.pack(src_ip, dest_ip, src_port or 0, dest_port or 0, packet_size, proto, flags)
+        for family, record in ((4, RECORD_V4), (6, RECORD_V6)):
+            if len(self.chunks[family]) >= CHUNK_RECORDS * record.size:
+                self.flush(family)
+
+    def flush(self, family):
+        self.files[family].write(self.chunks[family])
+        self.chunks[family].clear()
+
+    def close(self):
+        for family in self.files:
+            self.flush(family)
+            self.files[family].close()
+
+
+def read_header(file, path):
+    magic, version, family, record_size = FILE_HEADER.unpack(file.read(FILE_HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} binary capture")
+    return family, record_size
+
+
+# Load both record files as NumPy structured arrays backed by the files themselves
+def load_capture(path):
+    """Return (ipv4_records, ipv6_records) as read-only memory-mapped structured arrays."""
+    import numpy as np
+
+    arrays = []
+    for family, file_path in ((4, path), (6, v6_path(path))):
+        address = ">u4" if family == 4 else "V16"
+        dtype = np.dtype([("src_ip", address), ("dest_ip", address), ("src_port", "<u2"), ("dest_port", "<u2"),
+                          ("size", "<u4"), ("proto", "u1"), ("flags", "u1")])
+        with open(file_path, "rb") as file:
+            read_header(file, file_path)
+        count = (os.path.getsize(file_path) - FILE_HEADER.size) // dtype.itemsize
+        if count == 0:
+            arrays.append(np.empty(0, dtype=dtype))
+        else:
+            arrays.append(np.memmap(file_path, dtype=dtype, mode="r", offset=FILE_HEADER.size, shape=(count,)))
+    return tuple(arrays)
+
+
+# Read the binary format without NumPy, one record tuple (packed addresses) at a time
+def iter_capture(path):
+    for family, file_path in ((4, path), (6, v6_path(path))):
+        with open(file_path, "rb") as file:
+            _, record_size = read_header(file, file_path)
+            record = RECORD_V4 if family == 4 else RECORD_V6
+            while True:
+                chunk = file.read(CHUNK_RECORDS * record_size)
+                if not chunk:
+                    break
+                for src_ip, dest_ip, src_port, dest_port, size, proto, flags in record.iter_unpack(chunk):
+                    if not flags & FLAG_PORTS:
+                        src_port = dest_port = None
+                    yield src_ip, dest_ip, proto, src_port, dest_port, size
+
+
+# Concatenate shard files of the same format into one capture, skipping missing shards
+def merge_captures(path, shard_paths, binary=False):
+    if binary:
+        for family_path in (lambda p: p, v6_path):
+            with open(family_path(path), "wb") as merged:
+                for shard in shard_paths:
+                    if not os.path.exists(family_path(shard)):
+                        continue
+                    with open(family_path(shard), "rb") as part:
+                        header = part.read(FILE_HEADER.size)
+                        if merged.tell() == 0:
+                            merged.write(header)
+                        shutil.copyfileobj(part, merged)
+                    os.remove(family_path(shard))
+        return
+
+    with open(path, mode="w", newline="") as merged:
+        for shard in shard_paths:
+            if not os.path.exists(shard):
+                continue
+            with open(shard, mode="r", newline="") as part:
+                header = part.readline()
+                if merged.tell() == 0:
+                    merged.write(header)
+                shutil.copyfileobj(part, merged)
+            os.remove(shard)
@@ -1,94 +1,265 @@
-import socket
-import struct
-import csv
+import argparse
+import multiprocessing
+import os
+import queue
+import signal
+import time
+
+from batch_writer import BatchedWriter
+from bpf_filter import attach_filter
+from capture import open_raw_socket, recv_frames, join_fanout, RingCapture
+from capture_format import BinaryCaptureWriter, CSVCaptureWriter, merge_captures, protocol_name
+from flow_table import FLOWS_FILENAME, FlowCSVWriter, FlowTable
+from pcap_reader import read_pcap
+from quantiles import ProtocolQuantiles, print_quantiles
+from sketches import SketchStats, print_sketch_stats
+from packet_parser import (ETH_P_IP, ETH_P_IPV6, IPPROTO_TCP, IPPROTO_UDP, address_format,
+                           parse_ethernet_header, parse_ipv4_header, parse_ipv6_header, parse_ports)
 
 # Define constants
-ETH_P_ALL = 0x0003  # Capture all protocols
-BUFFER_SIZE = 65535
 CSV_FILENAME = "fast_captured_packets_info.csv"
+BIN_FILENAME = "fast_captured_packets_info.bin"
 
-# Helper functions
-def ip_format(addr):
-    return ".".join(map(str, addr))
-
-def ipv6_format(addr):
-    return ":".join(f"{addr[i]:02x}{addr[i+1]:02x}" for i in range(0, 16, 2))
-
-def parse_ethernet_header(raw_data):
-    _, _, eth_proto = struct.unpack("!6s6sH", raw_data[:14])
-    return socket.htons(eth_proto), raw_data[14:]
-
-def parse_ipv4_header(raw_data):
-    ip_header = struct.unpack("!BBHHHBBH4s4s", raw_data[:20])
-    proto = ip_header[6]
-    src_ip = ip_format(ip_header[8])
-    dest_ip = ip_format(ip_header[9])
-    return proto, src_ip, dest_ip, raw_data[20:]
 
-def parse_ipv6_header(raw_data):
-    ipv6_header = struct.unpack("!IHBB16s16s", raw_data[:40])
-    next_header = ipv6_header[2]
-    src_ip = ipv6_format(ipv6_header[4])
-    dest_ip = ipv6_format(ipv6_header[5])
-    return next_header, src_ip, dest_ip, raw_data[40:]
+# Open the record writer for the chosen output format
+def open_output(filename, binary):
+    if binary:
+        return None, BinaryCaptureWriter(filename)
+    file = open(filename, mode="w", newline="")
+    return file, CSVCaptureWriter(file)
 
-def parse_tcp_udp_header(raw_data, is_tcp=True):
-    header_format = "!HHHH" if not is_tcp else "!HHLLBBHHH"
-    header_size = 8 if not is_tcp else 20
-    parsed = struct.unpack(header_format, raw_data[:header_size])
-    return parsed[0], parsed[1], raw_data[header_size:]
 
-def parse_icmp_igmp_header(raw_data):
-    icmp_type, code = struct.unpack("!BB", raw_data[:2])
-    return icmp_type, code
+# Capture loop: parse every frame and hand it to the writer thread
+def sniff(frames, output_filename=CSV_FILENAME, binary=False, lossless=False,
+          flows_filename=None, write_packets=True, flow_settings=None, sketch=None, quantiles=None):
+    """
+    With flows_filename, also keep a FlowTable (flow_settings are its keyword
+    arguments) and write its exported flow records there. write_packets=False
+    keeps only the flow records. A SketchStats passed as sketch and a
+    ProtocolQuantiles passed as quantiles are updated with every packet.
+    """
+    total_captured_packets = 0
 
-# Create raw socket
-sniffer = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.ntohs(ETH_P_ALL))
-
-total_captured_packets = 0
-total_saved_packets = 0
-
-# Open CSV file for logging
-with open(CSV_FILENAME, mode="w", newline="") as file:
-    writer = csv.writer(file)
-    writer.writerow(["Src IP", "Dest IP", "Protocol", "Src Port", "Dest Port", "Packet Size"])
+    file = writer = None
+    if write_packets:
+        file, sink = open_output(output_filename, binary)
+        writer = BatchedWriter(sink, lossless=lossless)
+    flow_file = flow_table = None
+    if flows_filename:
+        flow_file = open(flows_filename, mode="w", newline="")
+        flow_writer = BatchedWriter(FlowCSVWriter(flow_file), echo=False, lossless=lossless)
+        flow_table = FlowTable(flow_writer.add, **(flow_settings or {}))
 
     try:
-        while True:
-            raw_data, _ = sniffer.recvfrom(BUFFER_SIZE)
+        for raw_data, packet_size, timestamp in frames:
             total_captured_packets = total_captured_packets + 1
-            packet_size = len(raw_data)
 
-            eth_proto, data = parse_ethernet_header(raw_data)
-            src_ip = dest_ip = src_port = dest_port = "N/A"
-            transport_protocol = "Other"
+            frame = memoryview(raw_data)
+            _, _, eth_proto, offset = parse_ethernet_header(frame)
+            src_port = dest_port = None
 
-            if eth_proto == 8:  # IPv4
-                proto, src_ip, dest_ip, data = parse_ipv4_header(data)
-            elif eth_proto == 0x86DD:  # IPv6
-                proto, src_ip, dest_ip, data = parse_ipv6_header(data)
+            if eth_proto == ETH_P_IP:
+                _, _, _, proto, src_ip, dest_ip, offset = parse_ipv4_header(frame, offset)
+            elif eth_proto == ETH_P_IPV6:
+                _, _, _, _, proto, _, src_ip, dest_ip, offset = parse_ipv6_header(frame, offset)
             else:
                 continue  # Skip non-IP packets
 
-            if proto == 6:  # TCP
-                src_port, dest_port, _ = parse_tcp_udp_header(data, is_tcp=True)
-                transport_protocol = "TCP"
-            elif proto == 17:  # UDP
-                src_port, dest_port, _ = parse_tcp_udp_header(data, is_tcp=False)
-                transport_protocol = "UDP"
-            elif proto == 1:  # ICMP
-                parse_icmp_igmp_header(data)
-                transport_protocol = "ICMP"
-            elif proto == 2:  # IGMP
-                parse_icmp_igmp_header(data)
-                transport_protocol = "IGMP"
-                
-            print(f"Packet: {src_ip}:{src_port} -> {dest_ip}:{dest_port}, Protocol: {transport_protocol}, Size: {packet_size}")
-
-            writer.writerow([src_ip, dest_ip, transport_protocol, src_port, dest_port, packet_size])
-            total_saved_packets = total_saved_packets + 1
+            if proto == IPPROTO_TCP or proto == IPPROTO_UDP:
+                src_port, dest_port = parse_ports(frame, offset)
+
+            if sketch:
+                sketch.add_packet(src_ip, dest_ip, src_port, dest_port, packet_size)
+            if quantiles:
+                quantiles.add(protocol_name(proto), packet_size, timestamp)
+
+            if flow_table:
+                tcp_flags = frame[offset + 13] if proto == IPPROTO_TCP and len(frame) > offset + 13 else 0
+                flow_table.add((src_ip, dest_ip, proto, src_port, dest_port), packet_size, timestamp, tcp_flags)
+
+            if writer:
+                # Addresses stay packed in the records, only the echoed line needs text
+                text = None
+                if writer.echo:
+                    ports = ("N/A", "N/A") if src_port is None else (src_port, dest_port)
+                    text = (f"Packet: {address_format(src_ip)}:{ports[0]} -> {address_format(dest_ip)}:{ports[1]}, "
+                            f"Protocol: {protocol_name(proto)}, Size: {packet_size}")
+                writer.add((src_ip, dest_ip, proto, src_port, dest_port, packet_size), text, timestamp)
 
     except KeyboardInterrupt:
-        print("\nSniffing stopped.")
-        print(f"\n Total captured Packets: {total_captured_packets} and Total saved Packets: {total_saved_packets} ")
-        sniffer.close()
+        pass
+
+    saved_packets = dropped_packets = exported_flows = 0
+    if writer:
+        writer.close()
+        writer.sink.close()
+        if file:
+            file.close()
+        saved_packets, dropped_packets = writer.written_records, writer.dropped_records
+    if flow_table:
+        flow_table.close()
+        flow_writer.close()
+        flow_file.close()
+        exported_flows = flow_table.exported_flows
+
+    return total_captured_packets, saved_packets, dropped_packets, exported_flows
+
+
+# Open the socket and the frame source for one capture process
+def open_capture(use_ring, filter_expression=None, fanout_group=None):
+    sniffer = open_raw_socket()
+    if filter_expression:
+        attach_filter(sniffer, filter_expression)
+    if fanout_group is not None:
+        join_fanout(sniffer, fanout_group)
+    ring = RingCapture(sniffer) if use_ring else None
+    frames = ring.frames() if ring else recv_frames(sniffer)
+    return sniffer, ring, frames
+
+
+def close_capture(sniffer, ring, frames):
+    frames.close()
+    if ring:
+        ring.close()
+    sniffer.close()
+
+
+def shard_filename(filename, index):
+    root, ext = os.path.splitext(filename)
+    return f"{root}.part{index}{ext}"
+
+
+# Worker process: capture its share of the fanout group into its own shard
+def capture_worker(index, fanout_group, use_ring, filter_expression, output_filename, binary, results,
+                   flows_filename=None, write_packets=True, flow_settings=None, sketch=None, quantiles=None):
+    sniffer, ring, frames = open_capture(use_ring, filter_expression, fanout_group)
+    counters = sniff(frames, shard_filename(output_filename, index), binary,
+                     flows_filename=flows_filename and shard_filename(flows_filename, index),
+                     write_packets=write_packets, flow_settings=flow_settings, sketch=sketch, quantiles=quantiles)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # A repeated Ctrl+C must not lose the counters
+    close_capture(sniffer, ring, frames)
+    results.put((counters, sketch, quantiles))
+
+
+# Run num_workers capture processes in one PACKET_FANOUT group until Ctrl+C
+def sniff_parallel(num_workers, use_ring, filter_expression=None, output_filename=CSV_FILENAME, binary=False,
+                   flows_filename=None, write_packets=True, flow_settings=None, sketch=None, quantiles=None):
+    """Each worker fills its own copy of sketch and quantiles; they are merged back into them."""
+    fanout_group = os.getpid() & 0xFFFF
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=capture_worker,
+                                       args=(index, fanout_group, use_ring, filter_expression,
+                                             output_filename, binary, results,
+                                             flows_filename, write_packets, flow_settings, sketch, quantiles))
+               for index in range(num_workers)]
+    for worker in workers:
+        worker.start()
+
+    # Read every worker's result before joining: a worker cannot exit until its
+    # result (a sketch can be larger than the pipe buffer) has been read.
+    # Ctrl+C from the terminal reaches every worker; forward it to any that missed it
+    reports = []
+    interrupted_at = None
+    while len(reports) < num_workers:
+        alive = any(worker.is_alive() for worker in workers)
+        try:
+            reports.append(results.get(timeout=1))
+        except queue.Empty:
+            if not alive:
+                break  # A worker died without reporting
+            if interrupted_at is not None and time.monotonic() - interrupted_at >= 1:
+                for worker in workers:
+                    if worker.is_alive():
+                        os.kill(worker.pid, signal.SIGINT)  # Ignored by workers already done
+        except KeyboardInterrupt:
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            interrupted_at = time.monotonic()
+    for worker in workers:
+        worker.join()
+
+    totals = [0, 0, 0, 0]
+    for counters, worker_sketch, worker_quantiles in reports:
+        for position, count in enumerate(counters):
+            totals[position] += count
+        if sketch:
+            sketch.merge(worker_sketch)
+        if quantiles:
+            quantiles.merge(worker_quantiles)
+
+    # Concatenate the worker shards under a single header and remove them
+    # (the fanout hash keeps each flow in a single worker)
+    if write_packets:
+        merge_captures(output_filename, [shard_filename(output_filename, index) for index in range(num_workers)], binary)
+    if flows_filename:
+        merge_captures(flows_filename, [shard_filename(flows_filename, index) for index in range(num_workers)])
+    return tuple(totals)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=f"Capture packets and log them to {CSV_FILENAME} or {BIN_FILENAME}")
+    parser.add_argument("--ring", action="store_true",
+                        help="read frames from a TPACKET_V3 memory-mapped ring instead of one recvfrom per frame")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="capture with this many processes sharing a PACKET_FANOUT group (hash mode)")
+    parser.add_argument("--filter", help='kernel-side BPF filter, e.g. "tcp", "host 10.1.2.200", "udp port 53"')
+    parser.add_argument("--format", choices=("csv", "bin"), default="csv",
+                        help="bin writes fixed-width binary records (see capture_format.py) instead of CSV")
+    parser.add_argument("--read", metavar="FILE", help="replay frames from a pcap/pcapng file instead of sniffing")
+    parser.add_argument("--flows", action="store_true",
+                        help=f"also keep a live flow table and write exported flow records to {FLOWS_FILENAME}")
+    parser.add_argument("--flows-only", action="store_true", help="like --flows, without the per-packet records")
+    parser.add_argument("--idle-timeout", type=float, default=15.0,
+                        help="export a flow after this many seconds without packets (default: %(default)s)")
+    parser.add_argument("--active-timeout", type=float, default=1800.0,
+                        help="export a long flow every this many seconds (default: %(default)s)")
+    parser.add_argument("--max-flows", type=int, default=100000,
+                        help="flow table size, the least recently seen flow is exported beyond it (default: %(default)s)")
+    parser.add_argument("--sketch", action="store_true",
+                        help="also estimate distinct IPs/pairs and the top pairs by bytes in fixed memory, printed at the end")
+    parser.add_argument("--quantiles", metavar="FILE",
+                        help="keep per-protocol packet size and inter-arrival percentile sketches and save them as JSON")
+    args = parser.parse_args()
+    if args.read and (args.ring or args.workers > 1 or args.filter):
+        parser.error("--read cannot be combined with --ring, --workers or --filter")
+
+    binary = args.format == "bin"
+    output_filename = BIN_FILENAME if binary else CSV_FILENAME
+    flows_filename = FLOWS_FILENAME if args.flows or args.flows_only else None
+    flow_options = dict(flows_filename=flows_filename, write_packets=not args.flows_only,
+                        flow_settings=dict(max_flows=args.max_flows, idle_timeout=args.idle_timeout,
+                                           active_timeout=args.active_timeout),
+                        sketch=SketchStats() if args.sketch else None,
+                        quantiles=ProtocolQuantiles(inter_arrival=args.workers <= 1)
+                        if args.quantiles else None)
+    start = time.time()
+    if args.read:
+        total_captured_packets, total_saved_packets, total_dropped_packets, total_flows = sniff(
+            read_pcap(args.read), output_filename, binary, lossless=True, **flow_options)
+    elif args.workers > 1:
+        total_captured_packets, total_saved_packets, total_dropped_packets, total_flows = sniff_parallel(
+            args.workers, args.ring, args.filter, output_filename, binary, **flow_options)
+    else:
+        sniffer, ring, frames = open_capture(args.ring, args.filter)
+        total_captured_packets, total_saved_packets, total_dropped_packets, total_flows = sniff(
+            frames, output_filename, binary, **flow_options)
+        close_capture(sniffer, ring, frames)
+
+    elapsed = time.time() - start
+
+    print("\nSniffing stopped.")
+    print(f"\n Total captured Packets: {total_captured_packets} and Total saved Packets: {total_saved_packets} "
+          f"(dropped by the writer: {total_dropped_packets})")
+    if flows_filename:
+        print(f" Exported flow records: {total_flows} (in {flows_filename})")
+    if flow_options["sketch"]:
+        print()
+        print_sketch_stats(flow_options["sketch"])
+    if flow_options["quantiles"]:
+        print()
+        print_quantiles(flow_options["quantiles"])
+        flow_options["quantiles"].save(args.quantiles)
+    print(f" Processed in {elapsed:.2f} s ({total_captured_packets / max(elapsed, 1e-9):.0f} packets/s)")
+
+
+if __name__ == "__main__":
+    main()
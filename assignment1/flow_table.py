@@ -0,0 +1,105 @@
+# Live 5-tuple flow table with NetFlow-style export
+#
+# Packets are folded into per-flow counters while capturing. A flow record is
+# exported when the flow has been idle for idle_timeout, has been open for
+# active_timeout (a long flow is then continued in a new record), ends with
+# FIN/RST, or is evicted because the table holds max_flows entries.
+import csv
+from collections import OrderedDict
+
+from capture_format import protocol_name
+from packet_parser import address_format
+
+FLOWS_FILENAME = "fast_flows.csv"
+FLOW_CSV_HEADER = ["Src IP", "Dest IP", "Protocol", "Src Port", "Dest Port",
+                   "Packets", "Bytes", "First Seen", "Last Seen", "End Reason"]
+
+# TCP flags
+TCP_FIN = 0x01
+TCP_RST = 0x04
+
+# Entry fields
+PACKETS, BYTES, FIRST_SEEN, LAST_SEEN = range(4)
+
+
+class FlowTable:
+    """
+    Keys are (src_ip, dest_ip, proto, src_port, dest_port) as in the packet
+    records, so each direction is its own flow. Exported records are the key
+    followed by (packets, bytes, first seen, last seen, end reason), handed to
+    export(record, timestamp=now) with the time of the packet that caused the
+    export (e.g. BatchedWriter.add, whose flush_interval runs on it).
+
+    The table is kept in last-seen order, so idle flows are always at the
+    front and expiring them costs nothing per packet.
+    """
+
+    def __init__(self, export, max_flows=100000, idle_timeout=15.0, active_timeout=1800.0):
+        self.export = export
+        self.max_flows = max_flows
+        self.idle_timeout = idle_timeout
+        self.active_timeout = active_timeout
+        self.flows = OrderedDict()
+        self.exported_flows = 0
+        self.evicted_flows = 0
+
+    def add(self, key, packet_size, timestamp, tcp_flags=0):
+        flows = self.flows
+        entry = flows.get(key)
+        if entry is not None and timestamp - entry[FIRST_SEEN] >= self.active_timeout:
+            self.export_flow(key, "active", timestamp)
+            entry = None
+        if entry is None:
+            entry = flows[key] = [0, 0, timestamp, timestamp]
+            if len(flows) > self.max_flows:
+                self.export_flow(next(iter(flows)), "evicted", timestamp)
+                self.evicted_flows += 1
+        else:
+            flows.move_to_end(key)
+        entry[PACKETS] += 1
+        entry[BYTES] += packet_size
+        entry[LAST_SEEN] = timestamp
+
+        if tcp_flags & TCP_RST:
+            self.export_flow(key, "rst", timestamp)
+        elif tcp_flags & TCP_FIN:
+            self.export_flow(key, "fin", timestamp)
+        self.expire(timestamp)
+
+    def expire(self, now):
+        flows = self.flows
+        deadline = now - self.idle_timeout
+        while flows:
+            key = next(iter(flows))
+            if flows[key][LAST_SEEN] >= deadline:
+                break
+            self.export_flow(key, "idle", now)
+
+    def export_flow(self, key, reason, now):
+        packets, size, first_seen, last_seen = self.flows.pop(key)
+        self.exported_flows += 1
+        self.export(key + (packets, size, first_seen, last_seen, reason), timestamp=now)
+
+    def close(self):
+        """Export every flow still open."""
+        while self.flows:
+            key = next(iter(self.flows))
+            self.export_flow(key, "end", self.flows[key][LAST_SEEN])
+
+
+# Write exported flow records as CSV, as a BatchedWriter sink
+class FlowCSVWriter:
+    def __init__(self, file):
+        self.writer = csv.writer(file)
+        self.writer.writerow(FLOW_CSV_HEADER)
+
+    def writerows(self, records):
+        na = "N/A"
+        self.writer.writerows(
+            [address_format(src_ip), address_format(dest_ip), protocol_name(proto),
+             na if src_port is None else src_port, na if dest_port is None else dest_port,
+             packets, size, f"{first_seen:.6f}", f"{last_seen:.6f}", reason]
+            for src_ip, dest_ip, proto, src_port, dest_port, packets, size, first_seen, last_seen, reason in records)
+
+    def close(self):
+        pass
@@ -0,0 +1,89 @@
+# Once-per-second traffic summary for the sniffers, instead of printing every packet
+import sys
+import threading
+import time
+
+from capture import read_packet_stats
+
+CLEAR_SCREEN = "\033[H\033[J"
+PROTOCOLS = ("TCP", "UDP", "ICMP", "Other")
+
+
+class LiveStats(threading.Thread):
+    """
+    Count packets from the capture loop and redraw a summary every interval.
+
+    add() only bumps counters. The display thread never resets them: it
+    diffs against the previous snapshot, and only swaps out the talkers dict,
+    so the capture loop never waits on it.
+    """
+
+    def __init__(self, sniffer=None, interval=1.0, top=5, output=sys.stdout):
+        super().__init__(daemon=True)
+        self.sniffer = sniffer
+        self.interval = interval
+        self.top = top
+        self.output = output
+        self.stopped = threading.Event()
+
+        # Written by the capture loop
+        self.packets = 0
+        self.bytes = 0
+        self.ipv6_packets = 0
+        self.protocols = dict.fromkeys(PROTOCOLS, 0)
+        self.talkers = {}
+
+        # Snapshot of the counters at the previous refresh
+        self.previous = (0, 0, 0, dict(self.protocols))
+        self.kernel_packets = 0
+        self.kernel_drops = 0
+
+        if sniffer is not None:
+            read_packet_stats(sniffer)  # Start the kernel counters from zero
+        self.start()
+
+    # Called from the capture loop
+    def add(self, protocol, src_ip, packet_size, ipv6=False):
+        self.packets += 1
+        self.bytes += packet_size
+        self.protocols[protocol] += 1
+        if ipv6:
+            self.ipv6_packets += 1
+        talkers = self.talkers
+        talkers[src_ip] = talkers.get(src_ip, 0) + packet_size
+
+    def run(self):
+        last = time.time()
+        while not self.stopped.wait(self.interval):
+            now = time.time()
+            self.refresh(now - last)
+            last = now
+
+    def refresh(self, elapsed):
+        current = (self.packets, self.bytes, self.ipv6_packets, dict(self.protocols))
+        talkers, self.talkers = self.talkers, {}
+        packets, size, ipv6_packets = (value - before for value, before in zip(current[:3], self.previous[:3]))
+        protocols = {name: current[3][name] - self.previous[3][name] for name in PROTOCOLS}
+        self.previous = current
+        if self.sniffer is not None:
+            kernel_packets, kernel_drops = read_packet_stats(self.sniffer)
+            self.kernel_packets += kernel_packets
+            self.kernel_drops += kernel_drops
+
+        lines = [CLEAR_SCREEN + "\U0001f50e Live traffic (Ctrl+C to stop)", ""]
+        lines.append(f"Packets/s: {packets / elapsed:12.0f}    Bytes/s: {size / elapsed:14.0f}")
+        mix = " | ".join(f"{name} {protocols[name] / max(packets, 1) * 100:5.1f}%" for name in PROTOCOLS)
+        lines.append(f"Protocols: {mix} | IPv6 {ipv6_packets / max(packets, 1) * 100:5.1f}%")
+        lines.append(f"Total:     {current[0]} packets, {current[1]} bytes")
+        if self.sniffer is not None:
+            lines.append(f"Kernel:    {self.kernel_packets} received, {self.kernel_drops} dropped")
+        lines.append("")
+        lines.append(f"Top {self.top} talkers (bytes in the last interval):")
+        for ip, count in sorted(list(talkers.items()), key=lambda item: item[1], reverse=True)[:self.top]:
+            lines.append(f"  {ip:>39}  {count:12d}")
+        self.output.write("\n".join(lines) + "\n")
+        self.output.flush()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
@@ -0,0 +1,142 @@
+# Header decoders shared by the sniffers
+#
+# Every parser takes the whole frame (bytes or memoryview) and the offset of
+# its header, and returns the decoded fields plus the offset of the next
+# layer. Nothing is sliced, so no layer copies the payload.
+#
+# Addresses are returned packed (4 or 16 bytes in network order) and only
+# turned into text with address_format() where they are printed or written.
+import struct
+
+# EtherType values
+ETH_P_IP = 0x0800
+ETH_P_IPV6 = 0x86DD
+
+# IP protocol numbers
+IPPROTO_ICMP = 1
+IPPROTO_IGMP = 2
+IPPROTO_TCP = 6
+IPPROTO_UDP = 17
+IPPROTO_ICMPV6 = 58
+
+# Precompiled header layouts
+ETH_HEADER = struct.Struct("!6s6sH")
+IPV4_HEADER = struct.Struct("!BBHHHBBH4s4s")
+IPV6_HEADER = struct.Struct("!IHBB16s16s")
+TCP_HEADER = struct.Struct("!HHLLBBHHH")
+UDP_HEADER = struct.Struct("!HHHH")
+ICMP_HEADER = struct.Struct("!BBH")
+PORTS = struct.Struct("!HH")
+
+
+# Function to format MAC addresses into human-readable format
+def mac_format(mac):
+    return ":".join(map("{:02x}".format, mac))
+
+
+# Function to format raw IP addresses into standard format
+def ip_format(addr):
+    return ".".join(map(str, addr))
+
+
+# Function to format IPv6 addresses into standard format
+def ipv6_format(addr):
+    return ":".join(f"{addr[i]:02x}{addr[i+1]:02x}" for i in range(0, 16, 2))
+
+
+# Function to format a packed IPv4 or IPv6 address
+def address_format(addr):
+    return ip_format(addr) if len(addr) == 4 else ipv6_format(addr)
+
+
+# Function to parse Ethernet header (14 bytes)
+def parse_ethernet_header(frame, offset=0):
+    """
+    Ethernet Frame Format:
+    - 6 bytes: Destination MAC
+    - 6 bytes: Source MAC
+    - 2 bytes: EtherType (e.g. 0x0800 IPv4, 0x86DD IPv6)
+    """
+    dest_mac, src_mac, eth_proto = ETH_HEADER.unpack_from(frame, offset)
+    return dest_mac, src_mac, eth_proto, offset + 14
+
+
+# Function to parse IPv4 header (20 bytes plus options)
+def parse_ipv4_header(frame, offset):
+    """
+    IPv4 Header Format:
+    - 1 byte: Version & IHL (Internet Header Length)
+    - 1 byte: Differentiated Services (TOS)
+    - 2 bytes: Total Length
+    - 2 bytes: Identification
+    - 2 bytes: Flags & Fragment Offset
+    - 1 byte: Time to Live (TTL)
+    - 1 byte: Protocol (6=TCP, 17=UDP, etc.)
+    - 2 bytes: Header Checksum
+    - 4 bytes: Source IP Address
+    - 4 bytes: Destination IP Address
+    """
+    version_ihl, _, _, _, _, ttl, proto, _, src_ip, dest_ip = IPV4_HEADER.unpack_from(frame, offset)
+    header_length = (version_ihl & 15) * 4
+    return version_ihl >> 4, header_length, ttl, proto, src_ip, dest_ip, offset + header_length
+
+
+# Function to parse IPv6 header (40 bytes)
+def parse_ipv6_header(frame, offset):
+    """
+    IPv6 Header Format (40 bytes):
+    - 4 bits: Version (should be 6)
+    - 8 bits: Traffic Class
+    - 20 bits: Flow Label
+    - 16 bits: Payload Length
+    - 8 bits: Next Header (e.g., TCP=6, UDP=17, ICMPv6=58)
+    - 8 bits: Hop Limit (like TTL in IPv4)
+    - 16 bytes: Source IP Address
+    - 16 bytes: Destination IP Address
+    """
+    first_word, payload_length, next_header, hop_limit, src_ip, dest_ip = IPV6_HEADER.unpack_from(frame, offset)
+    version = (first_word >> 28) & 0xF
+    traffic_class = (first_word >> 20) & 0xFF
+    flow_label = first_word & 0xFFFFF
+    return version, traffic_class, flow_label, payload_length, next_header, hop_limit, src_ip, dest_ip, offset + 40
+
+
+# Function to parse TCP header (20 bytes plus options)
+def parse_tcp_header(frame, offset):
+    """
+    TCP Header Format:
+    - 2 bytes: Source Port
+    - 2 bytes: Destination Port
+    - 4 bytes: Sequence Number
+    - 4 bytes: Acknowledgment Number
+    - 4 bits: Data Offset
+    - 1 byte: Flags (FIN=0x01, SYN=0x02, RST=0x04, PSH=0x08, ACK=0x10)
+    - 2 bytes: Window, 2 bytes: Checksum, 2 bytes: Urgent Pointer
+    """
+    src_port, dest_port, seq, ack, data_offset, flags, _, checksum, _ = TCP_HEADER.unpack_from(frame, offset)
+    header_length = (data_offset >> 4) * 4
+    return src_port, dest_port, seq, ack, flags, checksum, header_length, offset + header_length
+
+
+# Function to parse UDP header (8 bytes)
+def parse_udp_header(frame, offset):
+    """
+    UDP Header Format:
+    - 2 bytes: Source Port
+    - 2 bytes: Destination Port
+    - 2 bytes: Length
+    - 2 bytes: Checksum
+    """
+    src_port, dest_port, length, _ = UDP_HEADER.unpack_from(frame, offset)
+    return src_port, dest_port, length, offset + 8
+
+
+# Function to read only the ports of a TCP or UDP header
+def parse_ports(frame, offset):
+    return PORTS.unpack_from(frame, offset)
+
+
+# Function to parse ICMP header
+def parse_icmp_header(frame, offset):
+    icmp_type, code, checksum = ICMP_HEADER.unpack_from(frame, offset)
+    return icmp_type, code, checksum, offset + 4
@@ -0,0 +1,114 @@
+# Multi-pattern, case-insensitive byte matcher for packet payloads
+#
+# The rules are compiled once into lowercased byte patterns and into an
+# Aho-Corasick automaton (a full DFA over bytes). search() lowercases the
+# payload once with bytes.translate, without decoding it, and looks for each
+# pattern with a C-speed `in`. The automaton is only walked over the few
+# bytes at either edge, so its state can be carried from one call to the
+# next and a pattern split across segments of a stream is still found.
+
+# Lowercase of every byte value, read as latin-1 like the payloads
+LOWER = bytes(range(256)).decode("latin-1").lower().encode("latin-1")
+
+
+class PayloadMatcher:
+    def __init__(self, rules):
+        """rules: iterable of (name, pattern) with pattern as str or bytes."""
+        self.rules = [(name, pattern.encode() if isinstance(pattern, str) else pattern) for name, pattern in rules]
+        if not self.rules or not all(pattern for _, pattern in self.rules):
+            raise ValueError("need at least one non-empty pattern")
+        self.window = max(len(pattern) for _, pattern in self.rules) - 1
+        # Same latin-1 case folding as the automaton
+        self.lowered = [(name, pattern.translate(LOWER)) for name, pattern in self.rules]
+        self.build()
+
+    @classmethod
+    def from_file(cls, path):
+        """Load "name: pattern" lines; blank lines and lines starting with # are skipped."""
+        rules = []
+        with open(path, "r") as file:
+            for line_number, line in enumerate(file, 1):
+                line = line.rstrip("\n")
+                if not line.strip() or line.lstrip().startswith("#"):
+                    continue
+                name, separator, pattern = line.partition(":")
+                if not separator:
+                    raise ValueError(f"{path}:{line_number}: expected 'name: pattern'")
+                rules.append((name.strip(), pattern.strip()))
+        return cls(rules)
+
+    def build(self):
+        # Trie over the lowercased patterns
+        children = [{}]
+        outputs = [set()]
+        for name, pattern in self.rules:
+            state = 0
+            for byte in pattern.translate(LOWER):
+                if byte not in children[state]:
+                    children[state][byte] = len(children)
+                    children.append({})
+                    outputs.append(set())
+                state = children[state][byte]
+            outputs[state].add(name)
+
+        # Breadth-first failure links, folded straight into a 256-way transition table
+        delta = [[0] * 256 for _ in children]
+        fail = [0] * len(children)
+        queue = []
+        for byte, child in children[0].items():
+            delta[0][byte] = child
+            queue.append(child)
+        for state in queue:
+            outputs[state] |= outputs[fail[state]]
+            for byte in range(256):
+                child = children[state].get(byte)
+                if child is None:
+                    delta[state][byte] = delta[fail[state]][byte]
+                else:
+                    fail[child] = delta[fail[state]][byte]
+                    delta[state][byte] = child
+                    queue.append(child)
+
+        # Upper-case bytes follow their lower-case transition
+        self.delta = [[row[LOWER[byte]] for byte in range(256)] for row in delta]
+        self.outputs = [frozenset(names) if names else None for names in outputs]
+
+    # Rules found anywhere in data
+    def find(self, data):
+        lowered = bytes(data).translate(LOWER)
+        return {name for name, pattern in self.lowered if pattern in lowered}
+
+    def run(self, data, state):
+        delta = self.delta
+        outputs = self.outputs
+        hits = set()
+        for byte in data:
+            state = delta[state][byte]
+            if outputs[state]:
+                hits |= outputs[state]
+        return hits, state
+
+    def search(self, data, state=None):
+        """
+        Return (names of the rules found in data, automaton state after data).
+
+        For a stream, pass 0 with the first chunk and the returned state with
+        each next chunk to also catch patterns that straddle the boundary.
+        With state=None the payload is matched on its own and None is returned.
+        """
+        # Complete matches inside data
+        hits = self.find(data)
+        if state is None:
+            return hits, None
+
+        # Matches that started in the previous chunk can only end in the first
+        # window bytes, and the end state depends only on the last window bytes
+        window = self.window
+        if state:
+            head_hits, state = self.run(data[:window], state)
+            hits |= head_hits
+        elif len(data) <= window:
+            return hits, self.run(data, 0)[1]
+        if len(data) <= window:
+            return hits, state
+        return hits, self.run(data[len(data) - window:], 0)[1]
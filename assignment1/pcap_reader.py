@@ -0,0 +1,111 @@
+# Offline input for the sniffers: stream frames out of pcap / pcapng files
+#
+# The file is memory-mapped and frames are yielded as memoryviews into the
+# mapping, with the same (frame, packet size, timestamp) shape as the live
+# capture sources in capture.py. Only Ethernet captures are supported.
+import mmap
+import struct
+
+LINKTYPE_ETHERNET = 1
+
+# Classic pcap
+PCAP_MAGIC_USEC = 0xA1B2C3D4
+PCAP_MAGIC_NSEC = 0xA1B23C4D
+
+# pcapng block types
+BLOCK_SECTION_HEADER = 0x0A0D0D0A
+BLOCK_INTERFACE = 0x00000001
+BLOCK_SIMPLE_PACKET = 0x00000003
+BLOCK_ENHANCED_PACKET = 0x00000006
+BYTE_ORDER_MAGIC = 0x1A2B3C4D
+OPTION_END = 0
+OPTION_IF_TSRESOL = 9
+
+
+def read_pcap(path):
+    """Yield (frame, packet size, timestamp) for every frame in a pcap or pcapng file."""
+    with open(path, "rb") as file:
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(data)
+    try:
+        if len(data) >= 4 and struct.unpack_from("<I", view)[0] == BLOCK_SECTION_HEADER:
+            yield from read_pcapng_frames(view)
+        else:
+            yield from read_pcap_frames(view)
+    finally:
+        view.release()
+        try:
+            data.close()
+        except BufferError:
+            pass  # A caller still holds a frame, the mapping goes away with it
+
+
+def check_linktype(linktype):
+    if linktype != LINKTYPE_ETHERNET:
+        raise ValueError(f"unsupported link type {linktype}, only Ethernet captures can be read")
+
+
+def read_pcap_frames(view):
+    magic = struct.unpack_from("<I", view)[0]
+    if magic in (PCAP_MAGIC_USEC, PCAP_MAGIC_NSEC):
+        order = "<"
+    else:
+        order = ">"
+        magic = struct.unpack_from(">I", view)[0]
+        if magic not in (PCAP_MAGIC_USEC, PCAP_MAGIC_NSEC):
+            raise ValueError("not a pcap or pcapng file")
+    resolution = 1e-9 if magic == PCAP_MAGIC_NSEC else 1e-6
+    check_linktype(struct.unpack_from(order + "I", view, 20)[0])
+
+    record = struct.Struct(order + "IIII")  # ts_sec, ts_frac, incl_len, orig_len
+    offset = 24
+    end = len(view) - record.size
+    while offset <= end:
+        ts_sec, ts_frac, incl_len, orig_len = record.unpack_from(view, offset)
+        offset += record.size
+        yield view[offset:offset + incl_len], orig_len, ts_sec + ts_frac * resolution
+        offset += incl_len
+
+
+def read_pcapng_frames(view):
+    order = "<"
+    header = struct.Struct("<II")
+    resolutions = []
+    offset = 0
+    while offset + 12 <= len(view):
+        block_type, block_length = header.unpack_from(view, offset)
+        if block_type == BLOCK_SECTION_HEADER:
+            # A new section can switch byte order and restarts the interface list
+            order = "<" if struct.unpack_from("<I", view, offset + 8)[0] == BYTE_ORDER_MAGIC else ">"
+            header = struct.Struct(order + "II")
+            block_length = header.unpack_from(view, offset)[1]
+            resolutions = []
+        elif block_type == BLOCK_INTERFACE:
+            linktype = struct.unpack_from(order + "H", view, offset + 8)[0]
+            check_linktype(linktype)
+            resolutions.append(interface_resolution(view, offset + 16, offset + block_length - 4, order))
+        elif block_type == BLOCK_ENHANCED_PACKET:
+            interface, ts_high, ts_low, cap_len, orig_len = struct.unpack_from(order + "IIIII", view, offset + 8)
+            start = offset + 28
+            yield view[start:start + cap_len], orig_len, ((ts_high << 32) | ts_low) * resolutions[interface]
+        elif block_type == BLOCK_SIMPLE_PACKET:
+            orig_len = struct.unpack_from(order + "I", view, offset + 8)[0]
+            start = offset + 12
+            yield view[start:start + min(orig_len, block_length - 16)], orig_len, 0.0
+        if block_length < 12:
+            raise ValueError(f"corrupt pcapng block at offset {offset}")
+        offset += block_length
+
+
+# Timestamp units of an interface, from its if_tsresol option (default microseconds)
+def interface_resolution(view, offset, end, order):
+    option = struct.Struct(order + "HH")
+    while offset + 4 <= end:
+        code, length = option.unpack_from(view, offset)
+        if code == OPTION_END:
+            break
+        if code == OPTION_IF_TSRESOL:
+            value = view[offset + 4]
+            return 2.0 ** -(value & 0x7F) if value & 0x80 else 10.0 ** -value
+        offset += 4 + (length + 3) // 4 * 4
+    return 1e-6
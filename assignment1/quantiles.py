@@ -0,0 +1,189 @@
+# Streaming packet size (and inter-arrival time) percentiles per protocol
+#
+# Values go into DDSketches: log-spaced buckets with a fixed relative error,
+# so a sketch of a whole day's packet sizes is a few hundred counters. Sketches
+# merge exactly (bucket counts add up) and are saved as JSON, so daily or
+# per-shard sketches can be combined later without the raw captures:
+#   python3 quantiles.py fast_captured_packets_info.csv --save monday.json
+#   python3 quantiles.py monday.json tuesday.json --save week.json
+import argparse
+import csv
+import json
+import math
+
+from capture_format import iter_capture, protocol_name
+
+PERCENTILES = (50, 90, 99, 99.9)
+ALL_PROTOCOLS = "All"
+
+
+class DDSketch:
+    """Quantiles within relative_accuracy of the true value, for values >= 0."""
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.bins = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0
+        self.min = None
+        self.max = None
+
+    def add(self, value, count=1):
+        if value <= 0:
+            self.zero_count += count
+        else:
+            index = math.ceil(math.log(value) / self.log_gamma)
+            self.bins[index] = self.bins.get(index, 0) + count
+        self.count += count
+        self.sum += value * count
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if rank < seen:
+                value = 2 * self.gamma ** index / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("cannot merge DDSketches with different relative accuracy")
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        bounds = [value for value in (self.min, other.min) if value is not None]
+        self.min = min(bounds) if bounds else None
+        bounds = [value for value in (self.max, other.max) if value is not None]
+        self.max = max(bounds) if bounds else None
+        return self
+
+    def to_dict(self):
+        return {"relative_accuracy": self.relative_accuracy, "zero_count": self.zero_count, "count": self.count,
+                "sum": self.sum, "min": self.min, "max": self.max,
+                "bins": {str(index): count for index, count in self.bins.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["relative_accuracy"])
+        sketch.bins = {int(index): count for index, count in data["bins"].items()}
+        for name in ("zero_count", "count", "sum", "min", "max"):
+            setattr(sketch, name, data[name])
+        return sketch
+
+
+class ProtocolQuantiles:
+    """One DDSketch per protocol (and for all packets) for each metric."""
+
+    METRICS = ("packet_size", "inter_arrival")
+
+    def __init__(self, relative_accuracy=0.01, inter_arrival=True):
+        self.relative_accuracy = relative_accuracy
+        # Gaps only mean something within one packet sequence: off for per-worker shards of one capture
+        self.inter_arrival = inter_arrival
+        self.sketches = {metric: {} for metric in self.METRICS}
+        self.last_seen = {}
+
+    def sketch(self, metric, protocol):
+        sketches = self.sketches[metric]
+        if protocol not in sketches:
+            sketches[protocol] = DDSketch(self.relative_accuracy)
+        return sketches[protocol]
+
+    def add(self, protocol, packet_size, timestamp=None):
+        """Add one packet; inter-arrival times are only kept when timestamps are given."""
+        for name in (protocol, ALL_PROTOCOLS):
+            self.sketch("packet_size", name).add(packet_size)
+            if timestamp is not None and self.inter_arrival:
+                previous = self.last_seen.get(name)
+                if previous is not None:
+                    self.sketch("inter_arrival", name).add(max(timestamp - previous, 0))
+                self.last_seen[name] = timestamp
+
+    def merge(self, other):
+        for metric in self.METRICS:
+            for protocol, sketch in other.sketches[metric].items():
+                self.sketch(metric, protocol).merge(sketch)
+        return self
+
+    def save(self, path):
+        with open(path, "w") as file:
+            json.dump({"relative_accuracy": self.relative_accuracy,
+                       "sketches": {metric: {protocol: sketch.to_dict() for protocol, sketch in sketches.items()}
+                                    for metric, sketches in self.sketches.items()}}, file)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as file:
+            data = json.load(file)
+        quantiles = cls(data["relative_accuracy"])
+        for metric, sketches in data["sketches"].items():
+            quantiles.sketches[metric] = {protocol: DDSketch.from_dict(sketch) for protocol, sketch in sketches.items()}
+        return quantiles
+
+
+def print_quantiles(quantiles):
+    units = {"packet_size": ("Packet Size", "bytes", 1), "inter_arrival": ("Inter-arrival Time", "ms", 1000)}
+    for metric in ProtocolQuantiles.METRICS:
+        sketches = quantiles.sketches[metric]
+        if not sketches:
+            continue
+        title, unit, scale = units[metric]
+        print(f"{title} percentiles ({unit}, within {quantiles.relative_accuracy * 100:g}%):")
+        print(f"  {'Protocol':<8}{'Count':>10}" + "".join(f"{f'p{p:g}':>10}" for p in PERCENTILES))
+        for protocol in sorted(sketches, key=lambda name: (name == ALL_PROTOCOLS, name)):
+            sketch = sketches[protocol]
+            values = "".join(f"{sketch.quantile(p / 100) * scale:>10.1f}" for p in PERCENTILES)
+            print(f"  {protocol:<8}{sketch.count:>10}{values}")
+        print()
+
+
+# Function to sketch the packet sizes of a CSV or (.bin) binary capture
+def analyze_capture(path, relative_accuracy=0.01):
+    quantiles = ProtocolQuantiles(relative_accuracy)
+    if path.endswith(".bin"):
+        for _, _, proto, _, _, packet_size in iter_capture(path):
+            quantiles.add(protocol_name(proto), packet_size)
+        return quantiles
+    with open(path, mode="r", newline="") as file:
+        reader = csv.reader(file)
+        header = next(reader)
+        protocol_index, size_index = header.index("Protocol"), header.index("Packet Size")
+        for row in reader:
+            quantiles.add(row[protocol_index], int(row[size_index]))
+    return quantiles
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-protocol packet size percentiles from captures or saved sketches")
+    parser.add_argument("inputs", nargs="+", help="CSV or .bin captures, or .json sketches saved earlier; all are merged")
+    parser.add_argument("--save", metavar="FILE", help="write the merged sketches as JSON")
+    parser.add_argument("--accuracy", type=float, default=0.01,
+                        help="relative accuracy of new sketches (default: %(default)s)")
+    args = parser.parse_args()
+
+    merged = None
+    for path in args.inputs:
+        quantiles = ProtocolQuantiles.load(path) if path.endswith(".json") else analyze_capture(path, args.accuracy)
+        merged = quantiles if merged is None else merged.merge(quantiles)
+    print_quantiles(merged)
+    if args.save:
+        merged.save(args.save)
+
+
+if __name__ == "__main__":
+    main()
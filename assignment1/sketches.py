@@ -0,0 +1,178 @@
+# Bounded-memory statistics for captures too large (or too hostile) for exact dictionaries
+#
+# HyperLogLog estimates the number of distinct sources, destinations and
+# pairs; weighted Space-Saving keeps the top pairs by bytes. Memory is fixed
+# by the parameters whatever the traffic, and both sketches report their
+# error bounds and merge, so shards and workers can be combined.
+import heapq
+import math
+from hashlib import blake2b
+
+from addr_keys import NO_PORT, flow_key, format_flow_key, packed_ip_key
+
+
+# Function to hash an int key of any width to 64 bits. Flow keys are ~300 bits, so they are hashed
+# as bytes: hash(int) reduces modulo 2**61 - 1 and folds the fields of wide keys together
+def mix64(key):
+    return int.from_bytes(blake2b(key.to_bytes((key.bit_length() + 7) // 8, "little"), digest_size=8).digest(),
+                          "little")
+
+
+class HyperLogLog:
+    """Distinct count of int keys in 2**precision bytes, relative standard error 1.04 / sqrt(2**precision)."""
+
+    def __init__(self, precision=14):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, key):
+        hashed = mix64(key)
+        index = hashed >> (64 - self.precision)
+        rest = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -rank for rank in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)  # Linear counting for small cardinalities
+        return round(estimate)
+
+    def relative_error(self):
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def merge(self, other):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+
+class SpaceSaving:
+    """
+    Weighted Space-Saving: the heaviest keys within capacity counters.
+
+    A reported weight w with error e means the true weight is in [w - e, w].
+    Any key heavier than total / capacity is guaranteed to be reported.
+    """
+
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self.weights = {}
+        self.errors = {}
+        self.heap = []  # One (weight, key) entry per key; may lag behind weights, never ahead
+        self.total = 0
+
+    def add(self, key, weight=1):
+        self.total += weight
+        weights = self.weights
+        if key in weights:
+            weights[key] += weight
+            return
+        if len(weights) < self.capacity:
+            weights[key] = weight
+            self.errors[key] = 0
+            heapq.heappush(self.heap, (weight, key))
+            return
+
+        # Replace the lightest key, refreshing stale heap entries until the top is exact
+        heap = self.heap
+        while heap[0][0] != weights[heap[0][1]]:
+            heapq.heapreplace(heap, (weights[heap[0][1]], heap[0][1]))
+        smallest, evicted = heap[0]
+        del weights[evicted]
+        del self.errors[evicted]
+        weights[key] = smallest + weight
+        self.errors[key] = smallest
+        heapq.heapreplace(heap, (smallest + weight, key))
+
+    def top(self, count):
+        """Return [(key, weight, error)] for the count heaviest keys."""
+        return [(key, weight, self.errors[key])
+                for key, weight in heapq.nlargest(count, self.weights.items(), key=lambda item: item[1])]
+
+    def error_bound(self):
+        return self.total / self.capacity
+
+    def merge(self, other):
+        """Add another summary; the errors of both are kept, so the bounds still hold."""
+        # A key missing from one summary may still have up to its smallest weight there
+        floor = min(self.weights.values(), default=0) if len(self.weights) >= self.capacity else 0
+        other_floor = min(other.weights.values(), default=0) if len(other.weights) >= other.capacity else 0
+        weights = {}
+        errors = {}
+        for key in set(self.weights) | set(other.weights):
+            weights[key] = self.weights.get(key, floor) + other.weights.get(key, other_floor)
+            errors[key] = (self.errors.get(key, floor) + other.errors.get(key, other_floor))
+        kept = heapq.nlargest(self.capacity, weights.items(), key=lambda item: item[1])
+        self.weights = dict(kept)
+        self.errors = {key: errors[key] for key in self.weights}
+        self.heap = [(weight, key) for key, weight in self.weights.items()]
+        heapq.heapify(self.heap)
+        self.total += other.total
+        return self
+
+
+class SketchStats:
+    """Drop-in for capture_analyzer.CaptureStats.add with fixed memory."""
+
+    def __init__(self, precision=14, top_capacity=1000):
+        self.total_data = 0
+        self.total_packets = 0
+        self.min_size = None
+        self.max_size = None
+        self.sources = HyperLogLog(precision)
+        self.destinations = HyperLogLog(precision)
+        self.pairs = HyperLogLog(precision)
+        self.top_pairs = SpaceSaving(top_capacity)
+
+    def add(self, src_ip, src_port, dest_ip, dest_port, packet_size):
+        self.total_data += packet_size
+        self.total_packets += 1
+        if self.min_size is None or packet_size < self.min_size:
+            self.min_size = packet_size
+        if self.max_size is None or packet_size > self.max_size:
+            self.max_size = packet_size
+        key = flow_key(src_ip, src_port, dest_ip, dest_port)
+        self.sources.add(src_ip)
+        self.destinations.add(dest_ip)
+        self.pairs.add(key)
+        self.top_pairs.add(key, packet_size)
+
+    # Called from the sniffer loop with packed addresses and None ports
+    def add_packet(self, src_ip, dest_ip, src_port, dest_port, packet_size):
+        if src_port is None:
+            src_port = dest_port = NO_PORT
+        self.add(packed_ip_key(src_ip), src_port, packed_ip_key(dest_ip), dest_port, packet_size)
+
+    def merge(self, other):
+        self.total_data += other.total_data
+        self.total_packets += other.total_packets
+        sizes = [size for size in (self.min_size, self.max_size, other.min_size, other.max_size) if size is not None]
+        if sizes:
+            self.min_size, self.max_size = min(sizes), max(sizes)
+        self.sources.merge(other.sources)
+        self.destinations.merge(other.destinations)
+        self.pairs.merge(other.pairs)
+        self.top_pairs.merge(other.top_pairs)
+        return self
+
+
+def print_sketch_stats(stats, top=10):
+    error = stats.sources.relative_error() * 100
+    print(f"Total Data Transferred: {stats.total_data} bytes")
+    print(f"Total Packets Transferred: {stats.total_packets}")
+    print(f"Minimum / Maximum Packet Size: {stats.min_size} / {stats.max_size} bytes")
+    print(f"\nDistinct counts (HyperLogLog, ±{error:.2f}% standard error, "
+          f"{len(stats.sources.registers)} bytes each):")
+    print(f"  Source IPs: ~{stats.sources.count()}")
+    print(f"  Destination IPs: ~{stats.destinations.count()}")
+    print(f"  Unique pairs: ~{stats.pairs.count()}")
+    print(f"\nTop {top} pairs by data (Space-Saving, {stats.top_pairs.capacity} counters; "
+          f"true bytes within [reported - error, reported], every pair above "
+          f"{stats.top_pairs.error_bound():.0f} bytes is tracked):")
+    for key, weight, error in stats.top_pairs.top(top):
+        src_ip, src_port, dest_ip, dest_port = format_flow_key(key)
+        print(f"  {src_ip}:{src_port} -> {dest_ip}:{dest_port}  {weight} bytes (error ≤ {error})")
@@ -0,0 +1,227 @@
+# Live SYN flood detection on the raw socket capture path
+#
+# Every SYN opens a half-open entry for its 4-tuple. The entry is resolved
+# when the client completes the handshake (ACK) or either side resets it
+# (RST). Legitimate hping3 -S traffic is resolved by the client's RST. A
+# --rand-source flood is never resolved, because the SYN-ACKs go to hosts
+# that do not exist. Counts are kept per second per destination ip:port, and
+# every second the last --window seconds are checked. A destination with at
+# least --min-rate SYN/s and a half-open share above --threshold raises an
+# alert with the onset second and the half-open SYN rate.
+#
+# Memory is bounded whatever the source addresses: the pending table keeps
+# at most max_pending tuples (the oldest are dropped, i.e. stay half-open),
+# and at most max_destinations destinations are tracked.
+#
+#   sudo python3 syn_detector.py --attack-start 1700000020.5
+#   python3 syn_detector.py --read syn_flood.pcap --attack-offset 20
+import argparse
+import time
+from collections import OrderedDict
+
+from packet_parser import (ETH_P_IP, ETH_P_IPV6, IPPROTO_TCP, address_format, parse_ethernet_header,
+                           parse_ipv4_header, parse_ipv6_header, parse_ports)
+from pcap_reader import read_pcap
+
+TCP_SYN = 0x02
+TCP_RST = 0x04
+TCP_ACK = 0x10
+
+# Per-second bucket fields
+SYNS, SYN_ACKS, RESOLVED = range(3)
+
+
+class Alert:
+    __slots__ = ("destination", "onset", "detected", "rate", "ratio", "cleared")
+
+    def __init__(self, destination, onset, detected, rate, ratio):
+        self.destination = destination
+        self.onset = onset
+        self.detected = detected
+        self.rate = rate
+        self.ratio = ratio
+        self.cleared = None
+
+
+class SynFloodDetector:
+    def __init__(self, window=5, threshold=0.8, min_rate=100.0, grace=1, max_pending=200000,
+                 max_destinations=1024, attack_start=None, report=print):
+        self.window = window
+        self.threshold = threshold
+        self.min_rate = min_rate
+        self.grace = grace  # Seconds a SYN gets to be answered before its bucket is judged
+        self.max_pending = max_pending
+        self.max_destinations = max_destinations
+        self.attack_start = attack_start
+        self.report = report
+        self.pending = OrderedDict()  # (src ip, src port, dst ip, dst port) -> (second, destination), oldest first
+        self.buckets = OrderedDict()  # (dst ip, dst port) -> {second: [syns, syn-acks, resolved]}
+        self.active = {}  # destination -> open Alert
+        self.alerts = []
+        self.current = None
+        self.dropped_pending = 0
+
+    def bucket(self, destination, second):
+        seconds = self.buckets.get(destination)
+        if seconds is None:
+            if len(self.buckets) >= self.max_destinations:
+                self.buckets.popitem(last=False)
+            seconds = self.buckets[destination] = {}
+        else:
+            self.buckets.move_to_end(destination)
+        counts = seconds.get(second)
+        if counts is None:
+            counts = seconds[second] = [0, 0, 0]
+        return counts
+
+    def resolve(self, key):
+        entry = self.pending.pop(key, None)
+        if entry is not None:
+            counts = self.buckets.get(entry[1], {}).get(entry[0])
+            if counts is not None:
+                counts[RESOLVED] += 1
+
+    def add(self, src_ip, dst_ip, src_port, dst_port, flags, timestamp):
+        second = int(timestamp)
+        if self.current is None:
+            self.current = second
+        elif second > self.current:
+            self.advance(second, timestamp)
+
+        if flags & TCP_SYN:
+            if flags & TCP_ACK:
+                self.bucket((src_ip, src_port), second)[SYN_ACKS] += 1
+                return
+            destination = (dst_ip, dst_port)
+            self.bucket(destination, second)[SYNS] += 1
+            key = (src_ip, src_port, dst_ip, dst_port)
+            pending = self.pending
+            pending.pop(key, None)  # A retransmitted or reused tuple starts over
+            pending[key] = (second, destination)
+            if len(pending) > self.max_pending:
+                pending.popitem(last=False)
+                self.dropped_pending += 1
+        elif flags & TCP_RST:
+            self.resolve((src_ip, src_port, dst_ip, dst_port))
+            self.resolve((dst_ip, dst_port, src_ip, src_port))
+        elif flags & TCP_ACK:
+            self.resolve((src_ip, src_port, dst_ip, dst_port))
+
+    # Judge the window that ends grace seconds before second, then drop what is too old to matter
+    def advance(self, second, timestamp):
+        self.current = second
+        end = second - self.grace
+        start = end - self.window
+        for destination, seconds in list(self.buckets.items()):
+            for old in [old for old in seconds if old < start]:
+                del seconds[old]
+            if not seconds:
+                del self.buckets[destination]
+                if destination in self.active:
+                    self.clear(destination, timestamp)
+                continue
+            window = [(old, seconds[old]) for old in range(start, end) if old in seconds]
+            syns = sum(counts[SYNS] for _, counts in window)
+            half_open = syns - sum(counts[RESOLVED] for _, counts in window)
+            ratio = half_open / max(syns, 1)
+            if destination in self.active:
+                if syns / self.window < self.min_rate / 2 or ratio < self.threshold / 2:
+                    self.clear(destination, timestamp)
+            elif syns / self.window >= self.min_rate and ratio >= self.threshold:
+                onset = next((old for old, counts in window
+                              if counts[SYNS] >= self.min_rate
+                              and counts[SYNS] - counts[RESOLVED] >= self.threshold * counts[SYNS]), start)
+                # Rate over the attack seconds only, not diluted by the quiet start of the window
+                rate = sum(counts[SYNS] - counts[RESOLVED] for old, counts in window if old >= onset) / (end - onset)
+                self.raise_alert(Alert(destination, onset, timestamp, rate, ratio))
+
+        pending = self.pending
+        while pending and next(iter(pending.values()))[0] < start:
+            pending.popitem(last=False)
+
+    def raise_alert(self, alert):
+        self.active[alert.destination] = alert
+        self.alerts.append(alert)
+        ip, port = alert.destination
+        message = (f"[ALERT] {time.strftime('%H:%M:%S', time.localtime(alert.detected))} SYN flood on "
+                   f"{address_format(ip)}:{port}: onset {time.strftime('%H:%M:%S', time.localtime(alert.onset))}, "
+                   f"~{alert.rate:.0f} half-open SYN/s, {alert.ratio * 100:.1f}% of SYNs unanswered")
+        if self.attack_start is not None:
+            message += f", detection latency {alert.detected - self.attack_start:.2f} s"
+        self.report(message)
+
+    def clear(self, destination, timestamp):
+        alert = self.active.pop(destination)
+        alert.cleared = timestamp
+        ip, port = destination
+        self.report(f"[CLEAR] {time.strftime('%H:%M:%S', time.localtime(timestamp))} SYN flood on "
+                    f"{address_format(ip)}:{port} over after {timestamp - alert.onset:.0f} s")
+
+
+# Function to feed TCP packets from a frame source into the detector
+def detect(frames, detector, attack_offset=None):
+    try:
+        for raw_data, _, timestamp in frames:
+            frame = memoryview(raw_data)
+            _, _, eth_proto, offset = parse_ethernet_header(frame)
+            if eth_proto == ETH_P_IP:
+                _, _, _, proto, src_ip, dst_ip, offset = parse_ipv4_header(frame, offset)
+            elif eth_proto == ETH_P_IPV6:
+                _, _, _, _, proto, _, src_ip, dst_ip, offset = parse_ipv6_header(frame, offset)
+            else:
+                continue
+            if proto != IPPROTO_TCP or len(frame) < offset + 14:
+                continue
+            flags = frame[offset + 13]
+            if attack_offset is not None and detector.attack_start is None and flags & (TCP_SYN | TCP_ACK) == TCP_SYN:
+                detector.attack_start = timestamp + attack_offset  # Relative to the first SYN, like analyze_syn_flood.py
+            src_port, dst_port = parse_ports(frame, offset)
+            detector.add(src_ip, dst_ip, src_port, dst_port, flags, timestamp)
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detect SYN floods live from the raw socket (or a pcap replay)")
+    parser.add_argument("--read", metavar="FILE", help="replay frames from a pcap/pcapng file instead of sniffing")
+    parser.add_argument("--ring", action="store_true", help="read frames from a TPACKET_V3 ring")
+    parser.add_argument("--filter", default="tcp", help="kernel-side BPF filter (default: %(default)s)")
+    parser.add_argument("--window", type=int, default=5, help="seconds of history judged (default: %(default)s)")
+    parser.add_argument("--threshold", type=float, default=0.8,
+                        help="half-open share of SYNs that raises an alert (default: %(default)s)")
+    parser.add_argument("--min-rate", type=float, default=100.0,
+                        help="SYN/s a destination needs before it can alert (default: %(default)s)")
+    parser.add_argument("--max-pending", type=int, default=200000,
+                        help="half-open tuples tracked, the oldest are dropped beyond it (default: %(default)s)")
+    parser.add_argument("--attack-start", type=float, metavar="EPOCH",
+                        help="known attack start (syn_flood_experiment.sh prints it), to report detection latency")
+    parser.add_argument("--attack-offset", type=float, metavar="SECONDS",
+                        help="or: the attack starts this long after the first SYN (20 in syn_flood_experiment.sh)")
+    args = parser.parse_args()
+
+    detector = SynFloodDetector(args.window, args.threshold, args.min_rate, max_pending=args.max_pending,
+                                attack_start=args.attack_start)
+    if args.read:
+        detect(read_pcap(args.read), detector, args.attack_offset)
+    else:
+        from fast_sniffer import close_capture, open_capture
+
+        sniffer, ring, frames = open_capture(args.ring, args.filter)
+        print("Watching for SYN floods (Ctrl+C to stop)")
+        detect(frames, detector, args.attack_offset)
+        close_capture(sniffer, ring, frames)
+
+    print(f"\n{len(detector.alerts)} alert(s), {detector.dropped_pending} half-open tuples dropped from the pending table")
+    for alert in detector.alerts:
+        ip, port = alert.destination
+        line = (f"  {address_format(ip)}:{port}: onset {alert.onset}, detected {alert.detected:.2f}, "
+                f"~{alert.rate:.0f} half-open SYN/s")
+        if detector.attack_start is not None:
+            line += f", latency {alert.detected - detector.attack_start:.2f} s"
+        if alert.cleared is not None:
+            line += f", cleared {alert.cleared:.2f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+# Per-flow TCP stream reassembly in front of the payload matcher
+#
+# Segments of each direction of a connection are put back in sequence order
+# and fed to a PayloadMatcher as one contiguous stream, so a pattern split
+# across two segments is still found. No stream bytes are kept: the
+# matcher's automaton state is the sliding overlap window between segments.
+# Only out-of-order segments are held, under a global byte budget.
+from collections import OrderedDict
+
+SEQ_MOD = 1 << 32
+SEQ_HALF = 1 << 31
+
+# TCP flags
+TCP_FIN = 0x01
+TCP_SYN = 0x02
+TCP_RST = 0x04
+
+
+class Flow:
+    __slots__ = ("next_seq", "state", "last_seen", "pending", "pending_bytes")
+
+    def __init__(self, next_seq, timestamp):
+        self.next_seq = next_seq
+        self.state = 0
+        self.last_seen = timestamp
+        self.pending = {}  # seq -> payload bytes that arrived ahead of next_seq
+        self.pending_bytes = 0
+
+
+class StreamReassembler:
+    """
+    Feed TCP segments in capture order, get back the rule names they complete.
+
+    Flows are keyed by the caller (one direction of a connection, e.g.
+    (src_ip, src_port, dest_ip, dest_port)) and kept in LRU order. A flow is
+    dropped on FIN/RST, after idle_timeout seconds without a segment, or as
+    the least recently used one when max_flows is reached. Out-of-order
+    segments are buffered until the gap closes, as long as the total stays
+    under max_buffered bytes; otherwise the gap is skipped as lost data.
+    """
+
+    def __init__(self, matcher, max_flows=200000, max_buffered=64 << 20, idle_timeout=120.0, max_gap=1 << 20):
+        self.matcher = matcher
+        self.max_flows = max_flows
+        self.max_buffered = max_buffered
+        self.idle_timeout = idle_timeout
+        self.max_gap = max_gap
+        self.flows = OrderedDict()
+        self.buffered_bytes = 0
+
+        # Counters for the summary
+        self.evicted_flows = 0
+        self.expired_flows = 0
+        self.skipped_gaps = 0
+
+    def feed(self, key, seq, flags, payload, timestamp):
+        flows = self.flows
+        flow = flows.get(key)
+        if flow is None or flags & TCP_SYN:
+            if flow is not None:
+                self.drop(key)
+            # Mid-stream pickup starts at the first segment seen
+            flow = Flow((seq + 1) % SEQ_MOD if flags & TCP_SYN else seq, timestamp)
+            flows[key] = flow
+            if len(flows) > self.max_flows:
+                self.drop(next(iter(flows)))
+                self.evicted_flows += 1
+        else:
+            flows.move_to_end(key)
+            flow.last_seen = timestamp
+
+        hits = set()
+        if payload:
+            # The SYN takes up one sequence number, so its data starts after it
+            hits = self.add_segment(flow, (seq + 1) % SEQ_MOD if flags & TCP_SYN else seq, payload)
+        if flags & (TCP_FIN | TCP_RST):
+            self.drop(key)
+        self.expire(timestamp)
+        return hits
+
+    def add_segment(self, flow, seq, payload):
+        ahead = (seq - flow.next_seq) % SEQ_MOD
+        if ahead >= SEQ_HALF:
+            # Retransmission or overlap: only the part past next_seq is new
+            behind = SEQ_MOD - ahead
+            if behind >= len(payload):
+                return set()
+            payload = payload[behind:]
+            ahead = 0
+
+        if ahead:
+            if ahead <= self.max_gap and self.buffered_bytes + len(payload) <= self.max_buffered:
+                held = flow.pending.get(seq)
+                if held is None or len(held) < len(payload):  # Keep the longer of two segments at one seq
+                    held_bytes = len(held) if held is not None else 0
+                    flow.pending[seq] = bytes(payload)
+                    flow.pending_bytes += len(payload) - held_bytes
+                    self.buffered_bytes += len(payload) - held_bytes
+                return set()
+            # Cannot wait for the missing data: carry on from here
+            self.skipped_gaps += 1
+            flow.state = 0
+            flow.next_seq = seq
+
+        matcher = self.matcher
+        hits, flow.state = matcher.search(payload, flow.state)
+        flow.next_seq = (flow.next_seq + len(payload)) % SEQ_MOD
+        if flow.pending:
+            self.deliver_pending(flow, hits)
+        return hits
+
+    def deliver_pending(self, flow, hits):
+        """
+        Feed the buffered segments that next_seq has reached. Segments may
+        overlap or be cut differently from the stream so far: every one that
+        starts at or before next_seq is taken out, the part past next_seq of
+        the one reaching furthest is searched, and segments entirely behind
+        next_seq (e.g. after a skipped gap) are dropped.
+        """
+        pending = flow.pending
+        while pending:
+            ready = None
+            for seq in [seq for seq in pending if (flow.next_seq - seq) % SEQ_MOD < SEQ_HALF]:
+                segment = pending.pop(seq)
+                flow.pending_bytes -= len(segment)
+                self.buffered_bytes -= len(segment)
+                behind = (flow.next_seq - seq) % SEQ_MOD
+                if behind < len(segment) and (ready is None or len(segment) - behind > len(ready)):
+                    ready = segment[behind:]
+            if ready is None:
+                break
+            segment_hits, flow.state = self.matcher.search(ready, flow.state)
+            hits |= segment_hits
+            flow.next_seq = (flow.next_seq + len(ready)) % SEQ_MOD
+
+    # Flows are in last-seen order, so the idle ones are at the front
+    def expire(self, now):
+        flows = self.flows
+        deadline = now - self.idle_timeout
+        while flows:
+            key = next(iter(flows))
+            if flows[key].last_seen >= deadline:
+                break
+            self.drop(key)
+            self.expired_flows += 1
+
+    def drop(self, key):
+        flow = self.flows.pop(key)
+        self.buffered_bytes -= flow.pending_bytes
@@ -0,0 +1,165 @@
+# NumPy/pandas backend for capture_analyzer
+#
+# The capture is loaded in chunks of typed columns. Addresses are integer
+# encoded (one code per distinct address, shared by all chunks) and ports
+# are ints with N/A as addr_keys.NO_PORT, so every statistic is a vectorized
+# operation: size totals and np.bincount over sizes and address codes, and a
+# pandas groupby over the 4-tuple for the bytes per pair. Only the distinct
+# addresses and the final per-pair table are touched from Python, to turn
+# them into the same CaptureStats the pure-Python backend produces.
+import numpy as np
+import pandas as pd
+
+from addr_keys import NO_PORT, flow_key, ip_key, packed_ip_key
+from capture_format import FLAG_PORTS, load_capture
+
+CHUNK_ROWS = 1 << 20
+FLOW_COLUMNS = ["src_ip", "src_port", "dest_ip", "dest_port"]
+
+
+# Grow a bincount accumulator to fit counts and add them
+def add_counts(total, counts):
+    if len(counts) > len(total):
+        counts = counts.copy()
+        counts[:len(total)] += total
+        return counts
+    total[:len(counts)] += counts
+    return total
+
+
+class ColumnStats:
+    def __init__(self):
+        self.address_keys = []  # code -> addr_keys int
+        self.address_codes = {}  # addr_keys int -> code
+        self.total_data = 0
+        self.total_packets = 0
+        self.min_size = None
+        self.max_size = None
+        self.size_counts = np.zeros(0, dtype=np.int64)
+        self.source_counts = np.zeros(0, dtype=np.int64)
+        self.dest_counts = np.zeros(0, dtype=np.int64)
+        self.flow_parts = []
+        self.flow_part_rows = 0
+
+    # Map the keys of a chunk's distinct addresses to the shared codes
+    def encode(self, keys):
+        address_codes = self.address_codes
+        codes = np.empty(len(keys), dtype=np.int64)
+        for position, key in enumerate(keys):
+            code = address_codes.get(key)
+            if code is None:
+                code = address_codes[key] = len(self.address_keys)
+                self.address_keys.append(key)
+            codes[position] = code
+        return codes
+
+    def add_chunk(self, src_codes, src_ports, dest_codes, dest_ports, sizes):
+        if len(sizes) == 0:
+            return
+        self.total_data += int(sizes.sum())
+        self.total_packets += len(sizes)
+        low, high = int(sizes.min()), int(sizes.max())
+        self.min_size = low if self.min_size is None else min(self.min_size, low)
+        self.max_size = high if self.max_size is None else max(self.max_size, high)
+        self.size_counts = add_counts(self.size_counts, np.bincount(sizes))
+        self.source_counts = add_counts(self.source_counts, np.bincount(src_codes))
+        self.dest_counts = add_counts(self.dest_counts, np.bincount(dest_codes))
+
+        frame = pd.DataFrame({"src_ip": src_codes, "src_port": src_ports, "dest_ip": dest_codes,
+                              "dest_port": dest_ports, "size": sizes})
+        part = frame.groupby(FLOW_COLUMNS, sort=False)["size"].sum()
+        self.flow_parts.append(part)
+        self.flow_part_rows += len(part)
+        if self.flow_part_rows > 4 * CHUNK_ROWS:
+            self.flow_parts = [self.flow_bytes()]
+            self.flow_part_rows = len(self.flow_parts[0])
+
+    # Bytes per (src ip, src port, dest ip, dest port), merged over all chunks
+    def flow_bytes(self):
+        if not self.flow_parts:
+            return pd.Series(dtype=np.int64)
+        return pd.concat(self.flow_parts).groupby(level=FLOW_COLUMNS, sort=False).sum()
+
+    def top_pairs(self, count):
+        """Return [(flow key, bytes)] for the count pairs with the most data."""
+        keys = self.address_keys
+        largest = self.flow_bytes().nlargest(count)
+        return [(flow_key(keys[src_ip], int(src_port), keys[dest_ip], int(dest_port)), int(size))
+                for (src_ip, src_port, dest_ip, dest_port), size in largest.items()]
+
+    def to_capture_stats(self):
+        """Convert to the capture_analyzer.CaptureStats layout (dicts keyed like the Python backend)."""
+        from capture_analyzer import CaptureStats
+
+        stats = CaptureStats()
+        keys = self.address_keys
+        stats.total_data = self.total_data
+        stats.total_packets = self.total_packets
+        stats.min_size = self.min_size
+        stats.max_size = self.max_size
+        stats.size_counts = {int(size): int(self.size_counts[size]) for size in np.flatnonzero(self.size_counts)}
+        stats.source_flows = {keys[code]: int(self.source_counts[code]) for code in np.flatnonzero(self.source_counts)}
+        stats.dest_flows = {keys[code]: int(self.dest_counts[code]) for code in np.flatnonzero(self.dest_counts)}
+        flows = self.flow_bytes()
+        stats.data_transfer = {
+            flow_key(keys[src_ip], src_port, keys[dest_ip], dest_port): size
+            for (src_ip, src_port, dest_ip, dest_port), size in zip(flows.index.tolist(), flows.tolist())}
+        return stats
+
+
+def analyze_csv_columns(path):
+    stats = ColumnStats()
+    port_columns = ["Src Port", "Dest Port"]
+    chunks = pd.read_csv(path, usecols=["Src IP", "Dest IP", "Src Port", "Dest Port", "Packet Size"],
+                         dtype={"Src IP": str, "Dest IP": str, "Packet Size": np.int64},
+                         na_values={name: ["N/A"] for name in port_columns}, keep_default_na=False,
+                         chunksize=CHUNK_ROWS)
+    for chunk in chunks:
+        codes = []
+        for column in ("Src IP", "Dest IP"):
+            inverse, uniques = pd.factorize(chunk[column])
+            codes.append(stats.encode([ip_key(text) for text in uniques])[inverse])
+        ports = [chunk[column].fillna(NO_PORT).to_numpy(np.int64) for column in port_columns]
+        stats.add_chunk(codes[0], ports[0], codes[1], ports[1], chunk["Packet Size"].to_numpy(np.int64))
+    return stats
+
+
+def analyze_binary_columns(path):
+    stats = ColumnStats()
+    for records in load_capture(path):
+        for start in range(0, len(records), CHUNK_ROWS):
+            chunk = records[start:start + CHUNK_ROWS]
+            codes = []
+            for column in ("src_ip", "dest_ip"):
+                if chunk.dtype[column].kind == "u":  # IPv4 as big-endian uint32, already its addr_keys int
+                    inverse, uniques = pd.factorize(chunk[column].astype(np.int64))
+                    keys = [int(value) for value in uniques]
+                else:  # IPv6 as 16 raw bytes
+                    raw = np.ascontiguousarray(chunk[column]).view(np.uint8).reshape(-1, 16)
+                    uniques, inverse = np.unique(raw, axis=0, return_inverse=True)
+                    keys = [packed_ip_key(row.tobytes()) for row in uniques]
+                codes.append(stats.encode(keys)[inverse.reshape(-1)])
+            has_ports = (chunk["flags"] & FLAG_PORTS) != 0
+            ports = [np.where(has_ports, chunk[column].astype(np.int64), NO_PORT) for column in ("src_port", "dest_port")]
+            stats.add_chunk(codes[0], ports[0], codes[1], ports[1], chunk["size"].astype(np.int64))
+    return stats
+
+
+# Function to analyze a CSV through its sidecar columnar cache (capture_cache.py)
+def analyze_cached_columns(path):
+    from capture_cache import load_cached_capture
+
+    capture = load_cached_capture(path)
+    stats = ColumnStats()
+    codes = stats.encode([ip_key(text) for text in capture.addresses])
+    for start in range(0, capture.rows, CHUNK_ROWS):
+        end = start + CHUNK_ROWS
+        stats.add_chunk(codes[capture.src_ip[start:end]], capture.src_port[start:end].astype(np.int64),
+                        codes[capture.dest_ip[start:end]], capture.dest_port[start:end].astype(np.int64),
+                        capture.size[start:end].astype(np.int64))
+    return stats
+
+
+# Function to analyze a CSV or (.bin) binary capture with vectorized operations
+def analyze_columns(path):
+    return analyze_binary_columns(path) if path.endswith(".bin") else analyze_csv_columns(path)
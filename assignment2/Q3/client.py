@@ -5,10 +5,14 @@ import json
 import sys
 import os
 
-def send_file(nagle, delayed_ack, host='127.0.0.1', port=5001, file_path='data.bin', output_log='client_log.txt'):
-    # Ensure file of 4096 bytes exists; create one if needed.
-    if not os.path.exists(file_path):
-        file_data = b'A' * 4096
+def send_file(nagle, delayed_ack, host='127.0.0.1', port=5001, file_path='data.bin', output_log='client_log.txt',
+              chunk_size=40, interval=1.0, file_size=4096):
+    """Send the file chunk_size bytes every interval seconds and return the client stats."""
+    # Ensure file of file_size bytes exists; create one if needed. Without a file_path the data is generated.
+    if file_path is None:
+        file_data = b'A' * file_size
+    elif not os.path.exists(file_path):
+        file_data = b'A' * file_size
         with open(file_path, "wb") as f:
             f.write(file_data)
     else:
@@ -33,9 +37,8 @@ def send_file(nagle, delayed_ack, host='127.0.0.1', port=5001, file_path='data.b
     first_send_time = None
     last_send_time = None
     total_sent = 0
-    chunk_size = 40        # send 40 bytes per chunk
 
-    # Send file data chunk-by-chunk with a 1-second interval to maintain the rate.
+    # Send file data chunk-by-chunk with a fixed interval (40 bytes every second by default) to maintain the rate.
     for i in range(0, len(file_data), chunk_size):
         current_time = time.time()
         if first_send_time is None:
@@ -44,7 +47,7 @@ def send_file(nagle, delayed_ack, host='127.0.0.1', port=5001, file_path='data.b
         chunk = file_data[i:i+chunk_size]
         client_sock.sendall(chunk)
         total_sent += len(chunk)
-        time.sleep(1)  # wait for 1 second between sends
+        time.sleep(interval)  # wait between sends
 
     end_time = time.time()
     duration = end_time - start_time
@@ -54,10 +57,12 @@ def send_file(nagle, delayed_ack, host='127.0.0.1', port=5001, file_path='data.b
         "duration": duration,
         "active_duration": active_duration
     }
-    with open(output_log, "w") as f:
-        json.dump(result, f, indent=4)
-    print(f"Client sent {total_sent} bytes in {duration:.2f} sec. Active transfer duration: {active_duration:.2f} sec. Log saved to {output_log}")
+    if output_log:
+        with open(output_log, "w") as f:
+            json.dump(result, f, indent=4)
+    print(f"Client sent {total_sent} bytes in {duration:.2f} sec. Active transfer duration: {active_duration:.2f} sec." + (f" Log saved to {output_log}" if output_log else ""))
     client_sock.close()
+    return result
 
 if __name__ == '__main__':
     if len(sys.argv) != 3:
@@ -1,12 +1,8 @@
 #!/usr/bin/env python3
 import json
 
-def compute_metrics(server_log='server_log.txt', client_log='client_log.txt', output_file='metrics.json'):
-    with open(server_log, "r") as f:
-        server_data = json.load(f)
-    with open(client_log, "r") as f:
-        client_data = json.load(f)
-
+def metrics_from(server_data, client_data):
+    """Metrics of one transfer from the server and client results (the JSON the logs hold)."""
     total_sent = client_data.get("total_sent", 0)
     total_received = server_data.get("total_received", 0)
     active_duration = server_data.get("active_duration", 1)  # use active transfer duration
@@ -26,6 +22,14 @@ def compute_metrics(server_log='server_log.txt', client_log='client_log.txt', ou
         "max_packet_size": max_packet_size,
         "active_duration_sec": active_duration
     }
+    return metrics
+
+def compute_metrics(server_log='server_log.txt', client_log='client_log.txt', output_file='metrics.json'):
+    with open(server_log, "r") as f:
+        server_data = json.load(f)
+    with open(client_log, "r") as f:
+        client_data = json.load(f)
+    metrics = metrics_from(server_data, client_data)
 
     with open(output_file, "w") as f:
         json.dump(metrics, f, indent=4)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# Run the Nagle / delayed-ACK scenarios in one process, in parallel
+#
+# Replaces run_tests.sh + combine_results.py. The scenario list is expanded
+# from config.json, every run gets its own server on a free port (the client
+# starts as soon as the server is listening), and the results are collected
+# straight from server.py / client.py / metrics.py into combined_results.json.
+#
+# config.json keys (all optional except scenarios or matrix):
+#   file_size, transfer_rate (bytes/s), chunk_size, repetitions  defaults for every scenario
+#   scenarios  list of {"nagle": ..., "delayed_ack": ..., and any default to override}
+#   matrix     {"nagle": [true, false], "chunk_size": [40, 400], ...}: every combination,
+#              used instead of scenarios
+import argparse
+import itertools
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from client import send_file
+from metrics import metrics_from
+from server import start_server
+
+DEFAULTS = {"file_size": 4096, "transfer_rate": 40, "chunk_size": 40, "repetitions": 1}
+READY_TIMEOUT = 10
+
+
+# Function to expand config.json into one settings dict per scenario
+def expand_scenarios(config):
+    defaults = {key: config.get(key, value) for key, value in DEFAULTS.items()}
+    if "matrix" in config:
+        names = list(config["matrix"])
+        scenarios = [dict(zip(names, values)) for values in itertools.product(*config["matrix"].values())]
+    else:
+        scenarios = config["scenarios"]
+    return [{**defaults, **scenario} for scenario in scenarios]
+
+
+def run_scenario(settings, host='127.0.0.1'):
+    """One transfer: a server on a free port, then the client once it listens. Returns (server, client) results."""
+    ready = threading.Event()
+    listening = {}
+    server_result = {}
+
+    def on_listening(port):
+        listening["port"] = port
+        ready.set()
+
+    def serve():
+        try:
+            server_result.update(start_server(settings["nagle"], settings["delayed_ack"], host, 0, None, on_listening))
+        finally:
+            ready.set()  # Never leave the client waiting if the server failed
+
+    server_thread = threading.Thread(target=serve, daemon=True)
+    server_thread.start()
+    if not ready.wait(READY_TIMEOUT) or "port" not in listening:
+        raise RuntimeError("server did not start listening")
+    client_result = send_file(settings["nagle"], settings["delayed_ack"], host, listening["port"], None, None,
+                              settings["chunk_size"], settings["chunk_size"] / settings["transfer_rate"],
+                              settings["file_size"])
+    server_thread.join()
+    return server_result, client_result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the scenarios of config.json concurrently and combine the metrics")
+    parser.add_argument("--config", default="config.json", help="scenario configuration (default: %(default)s)")
+    parser.add_argument("--output", default="combined_results.json", help="results file (default: %(default)s)")
+    parser.add_argument("--parallel", type=int, default=0, help="scenarios run at once (default: all of them)")
+    parser.add_argument("--repetitions", type=int, help="override the repetitions of every scenario")
+    args = parser.parse_args()
+
+    with open(args.config, "r") as f:
+        config_data = json.load(f)
+    scenarios = expand_scenarios(config_data)
+    if args.repetitions:
+        for settings in scenarios:
+            settings["repetitions"] = args.repetitions
+    runs = [(index, repetition, settings) for index, settings in enumerate(scenarios)
+            for repetition in range(settings["repetitions"])]
+    print(f"Running {len(scenarios)} scenarios, {len(runs)} runs")
+
+    with ThreadPoolExecutor(max_workers=args.parallel or len(runs)) as pool:
+        futures = [pool.submit(run_scenario, settings) for _, _, settings in runs]
+        results = []
+        for (index, repetition, settings), future in zip(runs, futures):
+            server_data, client_data = future.result()
+            results.append({
+                "scenario": index,
+                "repetition": repetition,
+                "config": settings,
+                "metrics": metrics_from(server_data, client_data)
+            })
+
+    # Same layout as combine_results.py, with the expanded settings and repetition of every run
+    with open(args.output, "w") as f:
+        json.dump({"configuration": config_data, "results": results}, f, indent=4)
+
+    print(f"\n{'Scenario':>8} {'Rep':>4} {'Nagle':>6} {'DelAck':>6} {'Chunk':>6} {'Throughput':>11} "
+          f"{'Max pkt':>8} {'Active s':>9}")
+    for result in results:
+        settings, metrics = result["config"], result["metrics"]
+        print(f"{result['scenario']:>8} {result['repetition']:>4} {str(settings['nagle']):>6} "
+              f"{str(settings['delayed_ack']):>6} {settings['chunk_size']:>6} "
+              f"{metrics['throughput_bytes_per_sec']:>11.2f} {metrics['max_packet_size']:>8} "
+              f"{metrics['active_duration_sec']:>9.2f}")
+    print(f"\nCombined results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -4,7 +4,8 @@ import time
 import json
 import sys
 
-def start_server(nagle, delayed_ack, host='127.0.0.1', port=5001, output_log='server_log.txt'):
+def start_server(nagle, delayed_ack, host='127.0.0.1', port=5001, output_log='server_log.txt', on_listening=None):
+    """Receive one connection and return its stats. port 0 picks a free port, passed to on_listening(port)."""
     # Create and configure socket
     server_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     server_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
@@ -13,7 +14,10 @@ def start_server(nagle, delayed_ack, host='127.0.0.1', port=5001, output_log='se
         server_sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
     server_sock.bind((host, port))
     server_sock.listen(1)
+    port = server_sock.getsockname()[1]
     print(f"Server listening on {host}:{port} (Nagle: {nagle}, Delayed ACK: {delayed_ack})")
+    if on_listening:
+        on_listening(port)
 
     conn, addr = server_sock.accept()
     with conn:
@@ -51,11 +55,13 @@ def start_server(nagle, delayed_ack, host='127.0.0.1', port=5001, output_log='se
             "active_duration": active_duration,
             "packet_sizes": packet_sizes
         }
-        with open(output_log, "w") as f:
-            json.dump(result, f, indent=4)
-        print(f"Server received {total_received} bytes. Total duration: {total_duration:.2f} sec, Active transfer duration: {active_duration:.2f} sec. Log saved to {output_log}")
+        if output_log:
+            with open(output_log, "w") as f:
+                json.dump(result, f, indent=4)
+        print(f"Server received {total_received} bytes. Total duration: {total_duration:.2f} sec, Active transfer duration: {active_duration:.2f} sec." + (f" Log saved to {output_log}" if output_log else ""))
 
     server_sock.close()
+    return result
 
 if __name__ == '__main__':
     if len(sys.argv) != 3:
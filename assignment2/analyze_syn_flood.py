@@ -1,36 +1,202 @@
+import argparse
+import os
+
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
-import os
+from matplotlib.colors import LogNorm
+
+CONNECTIONS_FILE = "~/Desktop/Computer_network/connections.csv"
+CONNECTION_END_FILE = "~/Desktop/Computer_network/connection_end.csv"
+OUTPUT_FILE = "~/Desktop/Computer_network/syn_flood_plot.png"
+EVENT_COLUMNS = ["time", "src_ip", "dst_ip", "src_port", "dst_port"]
+TUPLE_COLUMNS = ["src_ip", "dst_ip", "src_port", "dst_port"]
+DEFAULT_DURATION = 100  # Seconds assigned to connections without a FIN or RST
+
+SCATTER_LIMIT = 50000  # --render auto draws one marker per connection up to this many
+DURATION_BINS = 200
+
+# Delays from syn_flood_experiment.sh, relative to the first connection
+ATTACK_START = 20
+ATTACK_DURATION = 100
+
+
+# Load the SYN (connection start) and FIN/RST (connection end) tables
+def load_tables(args):
+    if args.events:
+        from syn_pcap_extract import load_events
+        return load_events(args.events)
+    syn_df = pd.read_csv(os.path.expanduser(args.connections), sep="\t", names=EVENT_COLUMNS)
+    end_df = pd.read_csv(os.path.expanduser(args.connection_end), sep="\t", names=EVENT_COLUMNS)
+    return syn_df, end_df
+
+
+def connection_durations(syn_df, end_df, default_duration=DEFAULT_DURATION):
+    """
+    Match every connection to the first FIN/RST on its 4-tuple at or after its SYN (left as-of join).
+
+    A FIN/RST can come from either side, so the end events are matched in both
+    directions. A SYN that follows another SYN on the same 4-tuple with no end
+    event between them is a retransmission and belongs to the same connection,
+    which starts at the first SYN. hping3 reuses source ports, so a SYN after
+    an end event on the 4-tuple starts a new connection. Connections without
+    an end get default_duration.
+    """
+    syn_df = syn_df[EVENT_COLUMNS].rename(columns={"time": "time_start"})
+    reverse = {"src_ip": "dst_ip", "dst_ip": "src_ip", "src_port": "dst_port", "dst_port": "src_port"}
+    end_df = pd.concat([end_df[EVENT_COLUMNS], end_df[EVENT_COLUMNS].rename(columns=reverse)], ignore_index=True)
+    end_df = end_df.rename(columns={"time": "time_end"}).sort_values("time_end", kind="stable")
+
+    syn_df = syn_df.sort_values("time_start", kind="stable", ignore_index=True)
+    merged_df = pd.merge_asof(syn_df, end_df, left_on="time_start", right_on="time_end", by=TUPLE_COLUMNS,
+                              direction="forward")
+    # A SYN opens a new connection unless the previous SYN on its 4-tuple is still waiting for its end.
+    # The first end after a connection's first SYN comes after all its retransmissions, so it is the end
+    # of the whole connection.
+    previous_end = merged_df.groupby(TUPLE_COLUMNS, sort=False)["time_end"].shift(1)
+    first_syn = merged_df.groupby(TUPLE_COLUMNS, sort=False).cumcount() == 0
+    merged_df = merged_df[first_syn | (previous_end <= merged_df["time_start"])].reset_index(drop=True)
+
+    # Compute connection duration, with the default for connections without proper termination
+    merged_df["duration"] = (merged_df["time_end"] - merged_df["time_start"]).fillna(default_duration)
+    return merged_df
+
+
+def plot_durations(merged_df, output_path, attack_start=ATTACK_START, attack_duration=ATTACK_DURATION,
+                   render="auto"):
+    """
+    Plot duration against start time, as a scatter or as a 2D histogram.
+
+    The density image bins start time per second and duration into
+    DURATION_BINS rows with np.histogram2d, so drawing it takes the same time
+    for a thousand connections or a hundred million.
+    """
+    if render == "auto":
+        render = "scatter" if len(merged_df) <= SCATTER_LIMIT else "density"
+    plt.figure(figsize=(10, 5))
+    first = merged_df["time_start"].min()
+    if render == "scatter":
+        plt.scatter(merged_df["time_start"], merged_df["duration"], color="red", label="Connection Duration")
+    else:
+        starts = merged_df["time_start"].to_numpy()
+        durations = merged_df["duration"].to_numpy()
+        seconds = max(int(np.ceil(starts.max() - first)), 1)
+        counts, x_edges, y_edges = np.histogram2d(
+            starts, durations, bins=(seconds, DURATION_BINS),
+            range=((first, first + seconds), (0, max(durations.max(), 1) * 1.02)))
+        mesh = plt.pcolormesh(x_edges, y_edges, np.ma.masked_equal(counts.T, 0), cmap="Reds",
+                              norm=LogNorm(vmin=1, vmax=max(counts.max(), 1)))
+        plt.colorbar(mesh, label="Connections per bin")
+    plt.axvspan(first + attack_start, first + attack_start + attack_duration, color="grey", alpha=0.1)
+    plt.axvline(x=first + attack_start, color="blue", linestyle="--", label=f"Attack Start ({attack_start:g}s)")
+    plt.axvline(x=first + attack_start + attack_duration, color="green", linestyle="--",
+                label=f"Attack Stop ({attack_start + attack_duration:g}s)")
+    plt.xlabel("Connection Start Time")
+    plt.ylabel("Connection Duration (s)")
+    plt.title("Effect of SYN Flood Attack on Connection Durations")
+    plt.legend(loc="upper right")
+    plt.savefig(output_path, dpi=300)  # Save with high resolution
+    plt.close()
+
+
+def per_second_metrics(merged_df):
+    """
+    Per second since the first SYN: new connections, completed connections
+    (by the second they ended), mean and p95 duration of the connections
+    that ended and unterminated connections (all by the second they started).
+    The default duration of unterminated connections is left out of the
+    duration columns, so the flood does not flatten them to that value.
+    """
+    first = merged_df["time_start"].min()
+    start_second = (merged_df["time_start"] - first).astype("int64")
+    ended = merged_df["time_end"].notna()
+    by_start = merged_df.loc[ended, "duration"].groupby(start_second[ended])
+    table = pd.DataFrame({
+        "new": start_second.value_counts(),
+        "completed": ((merged_df.loc[ended, "time_end"] - first).astype("int64")).value_counts(),
+        "mean_duration": by_start.mean(),
+        "p95_duration": by_start.quantile(0.95),
+        "unterminated": (~ended).groupby(start_second).sum(),
+    })
+    table = table.reindex(range(int(table.index.max()) + 1))
+    table[["new", "completed", "unterminated"]] = table[["new", "completed", "unterminated"]].fillna(0).astype("int64")
+    table.index.name = "second"
+    return table
+
+
+# Function to summarise a run over the before / during / after attack phases: per-second rates from
+# the table, mean and p95 duration over the connections of each phase that ended
+def phase_summary(merged_df, table, attack_start=ATTACK_START, attack_duration=ATTACK_DURATION):
+    bins = [-1, attack_start - 1, attack_start + attack_duration - 1, float("inf")]
+    labels = ["before", "during", "after"]
+    phase = pd.cut(table.index, bins, labels=labels)
+    summary = table.groupby(phase, observed=False).agg(
+        seconds=("new", "size"), new_per_s=("new", "mean"), completed_per_s=("completed", "mean"),
+        unterminated=("unterminated", "sum"))
+
+    ended = merged_df[merged_df["time_end"].notna()]
+    start_second = (ended["time_start"] - merged_df["time_start"].min()).astype("int64")
+    durations = ended["duration"].groupby(pd.cut(start_second, bins, labels=labels), observed=False)
+    summary.insert(3, "mean_duration", durations.mean())
+    summary.insert(4, "p95_duration", durations.quantile(0.95))
+    return summary
 
-# Load TCP connections (SYN packets)
-syn_df = pd.read_csv("~/Desktop/Computer_network/connections.csv", sep="\t", names=["time", "src_ip", "dst_ip", "src_port", "dst_port"])
 
-# Load TCP termination events (FIN or RESET)
-end_df = pd.read_csv("~/Desktop/Computer_network/connection_end.csv", sep="\t", names=["time", "src_ip", "dst_ip", "src_port", "dst_port"])
+def main():
+    parser = argparse.ArgumentParser(description="Connection durations before, during and after a SYN flood")
+    parser.add_argument("--connections", default=CONNECTIONS_FILE,
+                        help="tab-separated SYN table (default: %(default)s)")
+    parser.add_argument("--connection-end", default=CONNECTION_END_FILE,
+                        help="tab-separated FIN/RST table (default: %(default)s)")
+    parser.add_argument("--events", metavar="DIR", help="read both tables from a syn_pcap_extract.py directory instead")
+    parser.add_argument("--output", default=OUTPUT_FILE, help="plot file (default: %(default)s)")
+    parser.add_argument("--save", metavar="FILE", help="also write the joined connection table as CSV")
+    parser.add_argument("--default-duration", type=float, default=DEFAULT_DURATION,
+                        help="duration of connections that never end (default: %(default)s s)")
+    parser.add_argument("--attack-start", type=float, default=ATTACK_START,
+                        help="seconds from the first connection to the attack (default: %(default)s)")
+    parser.add_argument("--attack-duration", type=float, default=ATTACK_DURATION,
+                        help="attack length in seconds (default: %(default)s)")
+    parser.add_argument("--render", choices=("auto", "density", "scatter"), default="auto",
+                        help=f"density: 2D histogram of start time x duration; "
+                             f"auto: scatter up to {SCATTER_LIMIT} connections (default: %(default)s)")
+    parser.add_argument("--timeseries", metavar="FILE",
+                        help="write per-second new/completed connections, mean/p95 duration of the ended ones "
+                             "and unterminated counts")
+    parser.add_argument("--label", default="run", help="name of this run in the per-second tables")
+    parser.add_argument("--compare", metavar="LABEL=DIR", action="append", default=[],
+                        help="add another run (a syn_pcap_extract.py directory) side by side, e.g. syncookies=events2")
+    args = parser.parse_args()
 
-# Merge data to compute connection duration
-merged_df = pd.merge(syn_df, end_df, on=["src_ip", "dst_ip", "src_port", "dst_port"], suffixes=("_start", "_end"))
+    syn_df, end_df = load_tables(args)
+    merged_df = connection_durations(syn_df, end_df, args.default_duration)
+    unterminated = merged_df["time_end"].isna().sum()
+    print(f"{len(merged_df)} connections, {unterminated} without a FIN/RST")
+    if args.save:
+        merged_df.to_csv(os.path.expanduser(args.save), index=False)
 
-# Compute connection duration
-merged_df["duration"] = merged_df["time_end"] - merged_df["time_start"]
+    if args.timeseries or args.compare:
+        from syn_pcap_extract import load_events
 
-# Assign default duration of 100s to connections without proper termination
-# merged_df["duration"].fillna(100, inplace=True)
-merged_df["duration"] = merged_df["duration"].fillna(100)
+        runs = {args.label: merged_df}
+        for run in args.compare:
+            label, _, directory = run.partition("=")
+            runs[label] = connection_durations(*load_events(directory), args.default_duration)
+        tables = {label: per_second_metrics(run_df) for label, run_df in runs.items()}
+        pd.set_option("display.width", 200)
+        for label, table in tables.items():
+            print(f"\n{label}: per phase")
+            print(phase_summary(runs[label], table, args.attack_start, args.attack_duration).round(3).to_string())
+        if args.timeseries:
+            combined = pd.concat(tables, axis=1)  # Runs side by side, one row per second
+            combined.columns = [f"{label}_{metric}" for label, metric in combined.columns]
+            combined.to_csv(os.path.expanduser(args.timeseries), float_format="%.6f")
 
-# Plot connection duration over time
-plt.figure(figsize=(10, 5))
-plt.scatter(merged_df["time_start"], merged_df["duration"], color="red", label="Connection Duration")
-plt.axvline(x=merged_df["time_start"].min() + 20, color="blue", linestyle="--", label="Attack Start (20s)")
-plt.axvline(x=merged_df["time_start"].min() + 120, color="green", linestyle="--", label="Attack Stop (120s)")
-plt.xlabel("Connection Start Time")
-plt.ylabel("Connection Duration (s)")
-plt.title("Effect of SYN Flood Attack on Connection Durations")
-plt.legend()
+    # Save the figure as an image file in Ubuntu's "Computer_network" directory
+    output_path = os.path.expanduser(args.output)
+    plot_durations(merged_df, output_path, args.attack_start, args.attack_duration, args.render)
+    print(f"Plot saved successfully at: {output_path}")
 
-# Save the figure as an image file in Ubuntu's "Computer_network" directory
-# output_path = "~/Desktop/Computer_network/syn_flood_plot.png"
-output_path = os.path.expanduser("~/Desktop/Computer_network/syn_flood_plot.png")
-plt.savefig(output_path, dpi=300)  # Save with high resolution
 
-print(f"Plot saved successfully at: {output_path}")
+if __name__ == "__main__":
+    main()
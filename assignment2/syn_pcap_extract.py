@@ -0,0 +1,216 @@
+# Extract the SYN and FIN/RST event tables for analyze_syn_flood.py straight from the pcap
+#
+# Replaces the tshark export. The capture is memory-mapped and only the
+# Ethernet, IPv4 and TCP header fields needed are unpacked. Two tables are
+# written:
+#   syn  connection attempts (SYN without ACK)
+#   end  FIN or RST packets, in either direction
+# each with the columns time, src_ip, dst_ip, src_port, dst_port (end also
+# has flags). Events are buffered in fixed-size arrays and appended to one
+# raw column file per field, so memory stays bounded however many SYNs the
+# flood sent. The output directory also gets a meta.json with the row counts
+# and dtypes; load_events() reads it back as pandas DataFrames.
+#
+#   python3 syn_pcap_extract.py syn_flood.pcap syn_flood_events
+#   python3 syn_pcap_extract.py syn_flood.pcap . --tsv   # connections.csv / connection_end.csv as before
+import argparse
+import json
+import mmap
+import os
+import socket
+import struct
+import sys
+from array import array
+
+PCAP_MAGIC_USEC = 0xA1B2C3D4
+PCAP_MAGIC_NSEC = 0xA1B23C4D
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+LINK_HEADER_SIZES = {LINKTYPE_ETHERNET: 14, LINKTYPE_RAW: 0, LINKTYPE_LINUX_SLL: 16}
+
+ETH_P_IP = 0x0800
+ETH_P_8021Q = 0x8100
+IPPROTO_TCP = 6
+TCP_FIN = 0x01
+TCP_SYN = 0x02
+TCP_RST = 0x04
+TCP_ACK = 0x10
+
+FLUSH_ROWS = 1 << 20
+COLUMNS = {"time": ("d", "f8"), "src_ip": ("I", "u4"), "dst_ip": ("I", "u4"),
+           "src_port": ("H", "u2"), "dst_port": ("H", "u2"), "flags": ("B", "u1")}
+TABLE_COLUMNS = {"syn": ["time", "src_ip", "dst_ip", "src_port", "dst_port"],
+                 "end": ["time", "src_ip", "dst_ip", "src_port", "dst_port", "flags"]}
+TSV_FILENAMES = {"syn": "connections.csv", "end": "connection_end.csv"}
+BYTE_ORDER = "<" if sys.byteorder == "little" else ">"
+
+
+class ColumnWriter:
+    """Appends rows of one table to raw column files, FLUSH_ROWS at a time."""
+
+    def __init__(self, directory, table):
+        self.columns = TABLE_COLUMNS[table]
+        self.buffers = [array(COLUMNS[name][0]) for name in self.columns]
+        self.files = [open(os.path.join(directory, f"{table}_{name}.{COLUMNS[name][1]}"), "wb")
+                      for name in self.columns]
+        self.rows = 0
+
+    def add(self, *row):
+        for buffer, value in zip(self.buffers, row):
+            buffer.append(value)
+        if len(self.buffers[0]) >= FLUSH_ROWS:
+            self.flush()
+
+    def flush(self):
+        self.rows += len(self.buffers[0])
+        for buffer, file in zip(self.buffers, self.files):
+            buffer.tofile(file)
+            del buffer[:]
+
+    def close(self):
+        self.flush()
+        for file in self.files:
+            file.close()
+
+
+class TSVWriter:
+    """The tab-separated text the tshark export produced (dotted addresses)."""
+
+    def __init__(self, directory, table):
+        self.file = open(os.path.join(directory, TSV_FILENAMES[table]), "w")
+        self.rows = 0
+
+    def add(self, timestamp, src_ip, dst_ip, src_port, dst_port, flags=None):
+        self.file.write(f"{timestamp:.6f}\t{socket.inet_ntoa(src_ip.to_bytes(4, 'big'))}\t"
+                        f"{socket.inet_ntoa(dst_ip.to_bytes(4, 'big'))}\t{src_port}\t{dst_port}\n")
+        self.rows += 1
+
+    def close(self):
+        self.file.close()
+
+
+# Function to read the pcap global header: (byte order, timestamp resolution, link type)
+def pcap_header(view):
+    if len(view) < 24:
+        raise ValueError("file too short for a pcap header")
+    for order in "<>":
+        magic = struct.unpack_from(order + "I", view)[0]
+        if magic in (PCAP_MAGIC_USEC, PCAP_MAGIC_NSEC):
+            break
+    else:
+        raise ValueError("not a classic pcap file (convert pcapng with: editcap -F pcap in.pcapng out.pcap)")
+    linktype = struct.unpack_from(order + "I", view, 20)[0]
+    if linktype not in LINK_HEADER_SIZES:
+        raise ValueError(f"unsupported link type {linktype}")
+    return order, 1e-9 if magic == PCAP_MAGIC_NSEC else 1e-6, linktype
+
+
+def extract(path, syn_writer, end_writer):
+    """Stream the pcap once, adding SYN and FIN/RST events to the writers. Returns (packets, tcp packets)."""
+    with open(path, "rb") as file:
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(data)
+    try:
+        order, resolution, linktype = pcap_header(view)
+        link_size = LINK_HEADER_SIZES[linktype]
+        record = struct.Struct(order + "IIII")
+        ethertype_at = {LINKTYPE_ETHERNET: 12, LINKTYPE_LINUX_SLL: 14}.get(linktype)
+        addresses = struct.Struct("!II")
+        ports = struct.Struct("!HH")
+        short = struct.Struct("!H")
+        add_syn, add_end = syn_writer.add, end_writer.add
+
+        packets = tcp_packets = 0
+        offset = 24
+        end = len(view) - record.size
+        while offset <= end:
+            ts_sec, ts_frac, incl_len, _ = record.unpack_from(view, offset)
+            frame = offset + record.size
+            offset = frame + incl_len
+            if offset > len(view):
+                break  # Truncated last record, e.g. tcpdump was killed mid-write
+            packets += 1
+
+            ip = frame + link_size
+            if ethertype_at is not None:
+                ethertype = short.unpack_from(view, frame + ethertype_at)[0]
+                if ethertype == ETH_P_8021Q and linktype == LINKTYPE_ETHERNET:
+                    ethertype = short.unpack_from(view, frame + 16)[0]
+                    ip += 4
+                if ethertype != ETH_P_IP:
+                    continue
+            # Need the IPv4 header, and 14 bytes of TCP header for ports and flags
+            if ip + 20 > offset or view[ip] >> 4 != 4 or view[ip + 9] != IPPROTO_TCP:
+                continue
+            tcp = ip + (view[ip] & 0x0F) * 4
+            if tcp + 14 > offset:
+                continue
+            tcp_packets += 1
+            flags = view[tcp + 13]
+            if flags & TCP_SYN:
+                if not flags & TCP_ACK:
+                    add_syn(ts_sec + ts_frac * resolution, *addresses.unpack_from(view, ip + 12),
+                            *ports.unpack_from(view, tcp))
+            elif flags & (TCP_FIN | TCP_RST):
+                add_end(ts_sec + ts_frac * resolution, *addresses.unpack_from(view, ip + 12),
+                        *ports.unpack_from(view, tcp), flags & (TCP_FIN | TCP_RST))
+        return packets, tcp_packets
+    finally:
+        view.release()
+        data.close()
+
+
+def write_meta(directory, source, packets, tcp_packets, writers):
+    meta = {"source": os.path.abspath(source), "packets": packets, "tcp_packets": tcp_packets,
+            "tables": {table: {"rows": writer.rows,
+                               "columns": {name: BYTE_ORDER + COLUMNS[name][1] for name in TABLE_COLUMNS[table]}}
+                       for table, writer in writers.items()}}
+    with open(os.path.join(directory, "meta.json"), "w") as file:
+        json.dump(meta, file, indent=2)
+
+
+def load_events(directory):
+    """Return (syn_df, end_df) from an extractor output directory; addresses are uint32 ints."""
+    import numpy as np
+    import pandas as pd
+
+    with open(os.path.join(directory, "meta.json")) as file:
+        meta = json.load(file)
+    tables = []
+    for table in ("syn", "end"):
+        info = meta["tables"][table]
+        columns = {}
+        for name, dtype in info["columns"].items():
+            path = os.path.join(directory, f"{table}_{name}.{dtype[1:]}")
+            columns[name] = np.memmap(path, dtype=dtype, mode="r", shape=(info["rows"],)) if info["rows"] \
+                else np.empty(0, dtype=dtype)
+        tables.append(pd.DataFrame(columns))
+    return tables[0], tables[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract SYN and FIN/RST event tables from a pcap")
+    parser.add_argument("pcap", help="classic pcap, e.g. the syn_flood.pcap from syn_flood_experiment.sh")
+    parser.add_argument("output", nargs="?", default="syn_flood_events",
+                        help="output directory (default: %(default)s)")
+    parser.add_argument("--tsv", action="store_true",
+                        help="write connections.csv and connection_end.csv (tab-separated, like the tshark export)")
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    writer_class = TSVWriter if args.tsv else ColumnWriter
+    writers = {table: writer_class(args.output, table) for table in ("syn", "end")}
+    try:
+        packets, tcp_packets = extract(args.pcap, writers["syn"], writers["end"])
+    finally:
+        for writer in writers.values():
+            writer.close()
+    if not args.tsv:
+        write_meta(args.output, args.pcap, packets, tcp_packets, writers)
+    print(f"{packets} packets, {tcp_packets} TCP: {writers['syn'].rows} SYNs and "
+          f"{writers['end'].rows} FIN/RST packets written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()